@@ -1,13 +1,23 @@
 import streamlit as st
 import os
+import pandas as pd
 
 from src.fmp.fmp_config import FMP_DATA_DIR
 from src.main import process_tickers
+from src.background_tasks import CANCELLED, DONE, BackgroundTask
+from src.compare.peer_ranking import PEER_GROUPS, get_peer_ranking
+from src.compare.similarity import COSINE, EUCLIDEAN, get_profile_index
+from src.fmp.fmp_panel import get_data_version
+from src.valuation.dcf import get_dcf_valuation
+from src.results_store import get_latest_results_version
+from src.watch import get_results_for_tickers
+from src.yfinance.yfinance_refresher import YahooQuoteRefresher
 from src.config_screener import SCREENER_PARAMS
 import src.global_variables as gv
 from src.utils import (
     add_ticker_current_info,
     load_tickers_blacklist,
+    numerize_columns,
     save_tickers_blacklist,
 )
 
@@ -130,15 +140,140 @@ st.markdown(
 )
 
 st.title("Magic Screener")
-available_tickers = os.listdir(FMP_DATA_DIR)
-available_tickers.sort()
 
-# Load blacklist and identify whitelisted tickers at startup
-blacklist_data = load_tickers_blacklist()
-blacklisted_tickers = blacklist_data.get("tickers", [])
-whitelisted_tickers = [t for t in available_tickers if t not in blacklisted_tickers]
 
-with st.sidebar:
+@st.cache_resource(show_spinner=False)
+def get_quote_refresher() -> YahooQuoteRefresher:
+    """
+    Background Yahoo Finance refresher shared by all sessions, started on first use.
+    There is a single refresher (and request budget) per server, its universe is
+    updated by the callers.
+    """
+    refresher = YahooQuoteRefresher()
+    refresher.start()
+    return refresher
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_available_tickers() -> list[str]:
+    return sorted(os.listdir(FMP_DATA_DIR))
+
+
+@st.cache_data(show_spinner=False)
+def cached_blacklist(blacklist_mtime: float) -> dict:
+    """
+    Blacklist data, reloaded only when the blacklist file changes.
+    """
+    return load_tickers_blacklist()
+
+
+def get_blacklist() -> dict:
+    file_path = os.path.join(gv.DATA_DIR, "tickers_blacklist.json")
+    mtime = os.path.getmtime(file_path) if os.path.exists(file_path) else 0.0
+    return cached_blacklist(mtime)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_data_version() -> str:
+    return get_data_version()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def cached_results(
+    tickers: tuple[str, ...],
+    screener_parameters: dict,
+    results_snapshot: str,
+    data_version: str,
+):
+    """
+    Screener results of the selected tickers, recomputed only when the selection,
+    the parameters, the published results snapshot or the statement data (checked
+    every minute, also without watch service) change.
+    """
+    # use the snapshot published by the watch service when available
+    return get_results_for_tickers(list(tickers), screener_parameters)
+
+
+def get_screener_parameters() -> dict:
+    return st.session_state.get(
+        "screener_parameters", {gv.FCF_YEARS: 3, gv.OCF_YEARS: 3}
+    )
+
+
+def get_filtered_results():
+    """
+    Returns (df_scores, df_features) for the applied selection and parameters,
+    df_scores filtered by the minimum score.
+    """
+    selected_tickers, min_score = st.session_state.get("applied_selection", ((), 0))
+    df_scores, df_features = cached_results(
+        selected_tickers,
+        get_screener_parameters(),
+        st.session_state.get("results_snapshot"),
+        cached_data_version(),
+    )
+    # Filter by score
+    if not df_scores.empty:
+        df_scores = df_scores[df_scores[gv.SCORE] >= min_score]
+    return df_scores, df_features
+
+
+def add_dcf_valuation(
+    df_scores: pd.DataFrame, quote_refresher: YahooQuoteRefresher
+) -> pd.DataFrame:
+    """
+    Adds the median intrinsic value per share and margin of safety over the DCF
+    scenario grid, using the raw market caps cached by the refresher.
+    """
+    tickers = df_scores["ticker"].tolist()
+    df_market = quote_refresher.get_metrics(tickers).set_index("ticker")
+    if gv.MARKET_CAP not in df_market.columns:
+        return df_scores
+    valuation = get_dcf_valuation(
+        growth_years=get_screener_parameters()[gv.FCF_YEARS],
+        data_version=cached_data_version(),
+    )
+    df_dcf = valuation.summarize(df_market[gv.MARKET_CAP])
+    return df_scores.merge(
+        df_dcf[[gv.INTRINSIC_VALUE_PER_SHARE, gv.MARGIN_OF_SAFETY]],
+        left_on="ticker",
+        right_index=True,
+        how="left",
+    )
+
+
+def update_blacklist(
+    tickers: list[str], screener_parameters: dict, threshold: int, progress_callback
+) -> int:
+    """
+    Background job of the "Update Blacklist" button.
+
+    Returns:
+        int: The number of blacklisted tickers.
+    """
+    df_scores_bl, _ = process_tickers(
+        tickers, screener_parameters, progress_callback=progress_callback
+    )
+    save_tickers_blacklist(df_scores_bl, threshold)
+    return len(load_tickers_blacklist().get("tickers", []))
+
+
+@st.fragment(run_every=30)
+def watch_results_snapshot():
+    """
+    Reruns the app when the watch service publishes a new results snapshot.
+    """
+    latest_snapshot = get_latest_results_version()
+    previous_snapshot = st.session_state.get("results_snapshot")
+    st.session_state["results_snapshot"] = latest_snapshot
+    if previous_snapshot is not None and previous_snapshot != latest_snapshot:
+        st.rerun()
+    if latest_snapshot:
+        st.caption(f"Results snapshot: {latest_snapshot}")
+
+
+@st.fragment
+def screener_parameters_panel():
     st.markdown(
         '<div class="section-header">Screener Parameters</div>',
         unsafe_allow_html=True,
@@ -161,145 +296,203 @@ with st.sidebar:
         help="Number of years to calculate Operating Cash Flow (OCF) growth.",
         key="ocf_years_input",
     )
-    st.write("---")
-
-tab1, tab2 = st.tabs(["Screener", "Compare"])
-
-with tab1:
+    trend_years = st.number_input(
+        label="Years regression trend:",
+        min_value=0,
+        max_value=5,
+        value=0,
+        step=1,
+        help="Number of years of the FCF, OCF and revenue regression trend criteria "
+        "(0 to disable).",
+        key="trend_years_input",
+    )
+    # Create an object (dictionary) to pass parameters
+    screener_parameters = {
+        gv.FCF_YEARS: fcf_years,
+        gv.OCF_YEARS: ocf_years,
+    }
+    if trend_years:
+        screener_parameters[gv.TREND_YEARS] = trend_years
+    previous_parameters = st.session_state.get("screener_parameters")
+    st.session_state["screener_parameters"] = screener_parameters
+    # results, chart and comparison depend on the parameters
+    if previous_parameters is not None and previous_parameters != screener_parameters:
+        st.rerun()
+
+
+@st.fragment
+def blacklist_panel():
+    blacklist_data = get_blacklist()
+    if not blacklist_data:
+        return
+    blacklisted_tickers = blacklist_data.get("tickers", [])
     st.markdown(
-        '<div class="section-header">Select Stocks</div>',
+        '<div class="section-header"> Tickers Blacklist</div>',
         unsafe_allow_html=True,
     )
+    with st.container():
+        st.markdown(
+            f"""
+            <div class="info-box">
+                <div style="font-size: 0.85rem; color: #94A3B8;">Date</div>
+                <div style="font-weight: 600; margin-bottom: 0.5rem;">{blacklist_data.get('date', 'N/A')}</div>
+                <div style="font-size: 0.85rem; color: #94A3B8;">Threshold</div>
+                <div style="font-weight: 600; margin-bottom: 0.5rem;">{blacklist_data.get('threshold_score', 'N/A')}</div>
+                <div style="font-size: 0.85rem; color: #94A3B8;">Tickers</div>
+                <div style="font-weight: 600;">{len(blacklisted_tickers)}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
 
-    col_left, col_right = st.columns([0.6, 0.4], gap="medium")
-
-    with col_left:
-        col_score, col_toggle = st.columns([1, 2])
-        with col_score:
-            min_score = st.number_input(
-                label="Min Score:",
-                min_value=0,
-                value=0,
-                step=1,
-                help="Minimum score to filter stocks.",
-                key="min_score_input",
-            )
-        with col_toggle:
-            st.write("")  # Vertical spacer to align with number inputs
-            st.write("")
-            current_data_dl = st.toggle(
-                label="download current data", key="current_data_dl_toggle"
-            )
-
-        # Create an object (dictionary) to pass parameters
-        screener_parameters = {
-            gv.FCF_YEARS: fcf_years,
-            gv.OCF_YEARS: ocf_years,
-        }
-
-        col_multiselect, col_select_all, col_select_whitelisted = st.columns([3, 1, 1])
-        with col_multiselect:
-            selected_tickers = st.multiselect(
-                label="Select stock tickers:",
-                options=available_tickers,
-                placeholder="Type or select tickers...",
-                help="Start typing to filter the list of available stock tickers.",
-                label_visibility="collapsed",
+    bl_threshold = st.number_input(
+        "BL Threshold:",
+        min_value=0,
+        value=int(blacklist_data.get("threshold_score", 0)),
+        key="bl_threshold_input",
+    )
+    task = st.session_state.get("blacklist_task")
+    is_running = task is not None and task.is_running
+    if st.button("Update Blacklist", disabled=is_running):
+        st.session_state["blacklist_task"] = BackgroundTask(
+            "update-blacklist",
+            update_blacklist,
+            cached_available_tickers(),
+            get_screener_parameters(),
+            bl_threshold,
+        ).start()
+        # show the progress panel
+        st.rerun()
+    if task is not None and not task.is_running:
+        # report the outcome once
+        del st.session_state["blacklist_task"]
+        if task.status == DONE:
+            st.info(
+                f"Blacklist updated! {task.result} tickers placed in the new blacklist."
             )
+        elif task.status == CANCELLED:
+            st.info("Blacklist update cancelled.")
+        else:
+            st.error(f"Blacklist update failed: {task.error}")
 
-        with col_select_all:
-            if st.button("Select All"):
-                selected_tickers = available_tickers
-
-        with col_select_whitelisted:
-            if st.button("Select Whitelisted"):
-                selected_tickers = whitelisted_tickers
 
-    # --- Blacklist Section in Sidebar ---
-    with st.sidebar:
-        if blacklist_data:
-            st.markdown(
-                '<div class="section-header"> Tickers Blacklist</div>',
-                unsafe_allow_html=True,
-            )
-            with st.container():
-                st.markdown(
-                    f"""
-                    <div class="info-box">
-                        <div style="font-size: 0.85rem; color: #94A3B8;">Date</div>
-                        <div style="font-weight: 600; margin-bottom: 0.5rem;">{blacklist_data.get('date', 'N/A')}</div>
-                        <div style="font-size: 0.85rem; color: #94A3B8;">Threshold</div>
-                        <div style="font-weight: 600; margin-bottom: 0.5rem;">{blacklist_data.get('threshold_score', 'N/A')}</div>
-                        <div style="font-size: 0.85rem; color: #94A3B8;">Tickers</div>
-                        <div style="font-weight: 600;">{len(blacklisted_tickers)}</div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True,
-                )
+@st.fragment(run_every=2)
+def blacklist_task_progress():
+    """
+    Polls the running blacklist update without blocking the rest of the app.
+    """
+    task = st.session_state.get("blacklist_task")
+    if task is None:
+        return
+    if not task.is_running:
+        # reload the blacklist and the whitelisted tickers
+        st.rerun()
+    st.progress(task.progress, text=f"Updating Blacklist... {task.progress:.0%}")
+    if st.button("Cancel", key="cancel_blacklist_task"):
+        task.cancel()
+
+
+def select_tickers(tickers: list[str]):
+    st.session_state["selected_tickers"] = tickers
+
+
+@st.fragment
+def selection_panel(available_tickers: list[str], whitelisted_tickers: list[str]):
+    col_score, _ = st.columns([1, 2])
+    with col_score:
+        min_score = st.number_input(
+            label="Min Score:",
+            min_value=0,
+            value=0,
+            step=1,
+            help="Minimum score to filter stocks.",
+            key="min_score_input",
+        )
 
-            bl_threshold = st.number_input(
-                "BL Threshold:",
-                min_value=0,
-                value=int(blacklist_data.get("threshold_score", 0)),
-                key="bl_threshold_input",
-            )
-            if st.button("Update Blacklist"):
-                with st.spinner("Updating Blacklist..."):
-                    df_scores_bl, df_features_bl = process_tickers(
-                        available_tickers, screener_parameters
-                    )
-                    save_tickers_blacklist(df_scores_bl, bl_threshold)
-                    # Reload blacklist data to update UI info
-                    blacklist_data = load_tickers_blacklist()
-                    blacklisted_tickers = blacklist_data.get("tickers", [])
-                    st.info(
-                        f"Blacklist updated! {len(blacklisted_tickers)} tickers placed in the new blacklist."
-                    )
-    # ------------------------------------
-
-    df_scores, df_features = process_tickers(selected_tickers, screener_parameters)
+    col_multiselect, col_select_all, col_select_whitelisted = st.columns([3, 1, 1])
+    with col_multiselect:
+        selected_tickers = st.multiselect(
+            label="Select stock tickers:",
+            options=available_tickers,
+            placeholder="Type or select tickers...",
+            help="Start typing to filter the list of available stock tickers.",
+            label_visibility="collapsed",
+            key="selected_tickers",
+        )
 
-    # Filter by score
-    if not df_scores.empty:
-        df_scores = df_scores[df_scores[gv.SCORE] >= min_score]
+    with col_select_all:
+        st.button("Select All", on_click=select_tickers, args=(available_tickers,))
 
-    with col_right:
-        if not df_scores.empty:
-            st.markdown(
-                '<div class="section-header">Score Distribution</div>',
-                unsafe_allow_html=True,
-            )
-            score_counts = df_scores[gv.SCORE].value_counts().reset_index()
-            score_counts.columns = [gv.SCORE, "Occurrences"]
-            score_counts = score_counts.sort_values(by=gv.SCORE)
+    with col_select_whitelisted:
+        st.button(
+            "Select Whitelisted",
+            on_click=select_tickers,
+            args=(whitelisted_tickers,),
+        )
 
-            st.bar_chart(score_counts, x=gv.SCORE, y="Occurrences", height=200)
-        else:
-            st.markdown("<br><br>", unsafe_allow_html=True)
-            st.info("Select tickers to see score distribution.")
+    selection = (tuple(selected_tickers), min_score)
+    previous_selection = st.session_state.get("applied_selection")
+    st.session_state["applied_selection"] = selection
+    # results and chart depend on the selection
+    if previous_selection is not None and previous_selection != selection:
+        st.rerun()
 
-    st.write("---")
 
+@st.fragment
+def score_distribution_panel():
+    df_scores, _ = get_filtered_results()
     if not df_scores.empty:
         st.markdown(
-            '<div class="section-header"> Screener Results</div>',
+            '<div class="section-header">Score Distribution</div>',
             unsafe_allow_html=True,
         )
-        print("checking if current data should be added")
-        if current_data_dl:
-            print("Adding current data to screener results")
-            progress_bar = st.progress(0, text="Fetching current data...")
+        score_counts = df_scores[gv.SCORE].value_counts().reset_index()
+        score_counts.columns = [gv.SCORE, "Occurrences"]
+        score_counts = score_counts.sort_values(by=gv.SCORE)
 
-            def update_progress(progress):
-                progress_bar.progress(
-                    progress, text=f"Fetching current data... {int(progress * 100)}%"
-                )
+        st.bar_chart(score_counts, x=gv.SCORE, y="Occurrences", height=200)
+    else:
+        st.markdown("<br><br>", unsafe_allow_html=True)
+        st.info("Select tickers to see score distribution.")
 
-            df_scores = add_ticker_current_info(
-                df_scores, progress_callback=update_progress
+
+@st.fragment
+def results_panel(available_tickers: list[str]):
+    df_scores, df_features = get_filtered_results()
+
+    if not df_scores.empty:
+        col_header, col_toggle = st.columns([2, 1])
+        with col_header:
+            st.markdown(
+                '<div class="section-header"> Screener Results</div>',
+                unsafe_allow_html=True,
+            )
+        with col_toggle:
+            current_data_dl = st.toggle(
+                label="download current data", key="current_data_dl_toggle"
             )
-            progress_bar.empty()
-        st.dataframe(df_scores, width="stretch")
+        if current_data_dl:
+            quote_refresher = get_quote_refresher()
+            quote_refresher.set_universe(available_tickers)
+            # tickers meeting at least one criterion are refreshed before the
+            # other viewed tickers
+            quote_refresher.mark_passing(
+                df_scores.loc[df_scores[gv.SCORE] > 0, "ticker"].tolist()
+            )
+            # merge the data already refreshed in background, missing tickers
+            # are fetched first and shown when the panel is refreshed
+            df_scores = add_ticker_current_info(df_scores, refresher=quote_refresher)
+            df_scores = add_dcf_valuation(df_scores, quote_refresher)
+            col_caption, col_refresh = st.columns([4, 1])
+            with col_caption:
+                n_fresh = int(df_scores[gv.P_E_RATIO].notna().sum())
+                st.caption(
+                    f"Current data available for {n_fresh} of {len(df_scores)} tickers."
+                )
+            with col_refresh:
+                # reruns this panel only
+                st.button("Refresh", key="refresh_current_data")
+        st.dataframe(numerize_columns(df_scores, [gv.MARKET_CAP]), width="stretch")
     else:
         st.info(
             "No data to display for Screener Results (Scores). Please select and process tickers."
@@ -311,8 +504,105 @@ with tab1:
             '<div class="section-header"><span>🔍</span> Detailed Features Data</div>',
             unsafe_allow_html=True,
         )
-        st.dataframe(df_features, width="stretch")
+        st.dataframe(numerize_columns(df_features), width="stretch")
     else:
         st.info(
             "No data to display for Detailed Features Data. Please select and process tickers."
         )
+
+
+@st.fragment
+def compare_panel():
+    st.markdown(
+        '<div class="section-header">Industry and Sector Percentiles</div>',
+        unsafe_allow_html=True,
+    )
+    screener_parameters = get_screener_parameters()
+    with st.spinner("Loading peer statistics..."):
+        peer_ranking = get_peer_ranking(
+            fcf_years=screener_parameters[gv.FCF_YEARS],
+            ocf_years=screener_parameters[gv.OCF_YEARS],
+            data_version=cached_data_version(),
+        )
+
+    compare_ticker = st.selectbox(
+        label="Ticker to compare:",
+        options=peer_ranking.tickers,
+        index=None,
+        placeholder="Type or select a ticker...",
+        key="compare_ticker_select",
+    )
+    if compare_ticker:
+        st.dataframe(
+            peer_ranking.get_ticker_comparison(compare_ticker), width="stretch"
+        )
+        peer_group = st.radio(
+            "Peers by:", PEER_GROUPS, horizontal=True, key="compare_peer_group"
+        )
+        st.dataframe(
+            peer_ranking.get_peers(compare_ticker, group=peer_group), width="stretch"
+        )
+
+        st.markdown(
+            '<div class="section-header">Similar Cash Flow Profiles</div>',
+            unsafe_allow_html=True,
+        )
+        col_k, col_metric = st.columns([1, 2])
+        with col_k:
+            n_similar = st.number_input(
+                "Number of tickers:",
+                min_value=1,
+                max_value=100,
+                value=20,
+                key="n_similar_input",
+            )
+        with col_metric:
+            similarity_metric = st.radio(
+                "Metric:", [COSINE, EUCLIDEAN], horizontal=True, key="similarity_metric"
+            )
+        with st.spinner("Loading similarity index..."):
+            profile_index = get_profile_index(cached_data_version())
+        st.dataframe(
+            profile_index.query(compare_ticker, k=n_similar, metric=similarity_metric),
+            width="stretch",
+        )
+    else:
+        st.info("Select a ticker to compare it with its Industry and Sector peers.")
+
+
+available_tickers = cached_available_tickers()
+
+# Load blacklist and identify whitelisted tickers
+blacklisted_tickers = set(get_blacklist().get("tickers", []))
+whitelisted_tickers = [t for t in available_tickers if t not in blacklisted_tickers]
+
+with st.sidebar:
+    screener_parameters_panel()
+    watch_results_snapshot()
+    st.write("---")
+    blacklist_panel()
+    task = st.session_state.get("blacklist_task")
+    if task is not None and task.is_running:
+        blacklist_task_progress()
+
+tab1, tab2 = st.tabs(["Screener", "Compare"])
+
+with tab1:
+    st.markdown(
+        '<div class="section-header">Select Stocks</div>',
+        unsafe_allow_html=True,
+    )
+
+    col_left, col_right = st.columns([0.6, 0.4], gap="medium")
+
+    with col_left:
+        selection_panel(available_tickers, whitelisted_tickers)
+
+    with col_right:
+        score_distribution_panel()
+
+    st.write("---")
+    results_panel(available_tickers)
+
+with tab2:
+    compare_panel()
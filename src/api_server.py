@@ -0,0 +1,338 @@
+import argparse
+import hashlib
+import io
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+
+from src.fmp.fmp_panel import get_data_version, list_available_tickers
+from src.results_store import get_latest_results_version
+from src.watch import get_results_for_tickers
+import src.global_variables as gv
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+FORMAT_JSON = "json"
+FORMAT_CSV = "csv"
+FORMAT_ARROW = "arrow"
+CONTENT_TYPES = {
+    FORMAT_JSON: "application/json",
+    FORMAT_CSV: "text/csv; charset=utf-8",
+    FORMAT_ARROW: "application/vnd.apache.arrow.stream",
+}
+FACET_COLUMNS = ["Sector", "Industry", "Country"]
+
+# the data version is recomputed at most this often (it costs one stat per file)
+DATA_VERSION_TTL = 5.0
+# number of screens and filtered tables kept in memory
+CACHE_SIZE = 64
+# /tickers and /facets responses smaller than this are sent whole, not compressed
+GZIP_MIN_SIZE = 1024
+# rows encoded per chunk of /screen responses
+CHUNK_ROWS = 1000
+
+
+class ScreenerQueryService:
+    """
+    Computes screener results for HTTP queries, caching the screens and the filtered
+    tables per (parameters, data version).
+    """
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        self.cache_size = cache_size
+        self._screens = OrderedDict()
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._data_version = None
+        self._data_version_time = 0.0
+
+    def get_version(self) -> str:
+        """
+        Version of the data the answers depend on: statement files, universe file and
+        latest results snapshot.
+        """
+        now = time.monotonic()
+        if (
+            self._data_version is None
+            or now - self._data_version_time > DATA_VERSION_TTL
+        ):
+            self._data_version = get_data_version()
+            self._data_version_time = now
+        return f"{self._data_version}:{get_latest_results_version()}"
+
+    def _cached(self, cache: OrderedDict, key, compute):
+        """
+        Returns cache[key], computing it once: concurrent requests for a key being
+        computed wait for that computation instead of starting their own.
+        """
+        flight_key = (id(cache), key)
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+            in_flight = self._in_flight.get(flight_key)
+            if in_flight is None:
+                self._in_flight[flight_key] = threading.Event()
+        if in_flight is not None:
+            in_flight.wait()
+            # computed meanwhile, or computed again if that computation failed
+            return self._cached(cache, key, compute)
+
+        try:
+            value = compute()
+            with self._lock:
+                cache[key] = value
+                while len(cache) > self.cache_size:
+                    cache.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(flight_key).set()
+
+    def get_screen(self, screener_parameters: dict, version: str) -> tuple:
+        """
+        Returns (df_scores, df_features) for the whole universe.
+        """
+        key = (json.dumps(screener_parameters, sort_keys=True), version)
+        return self._cached(
+            self._screens,
+            key,
+            lambda: get_results_for_tickers(
+                list_available_tickers(), screener_parameters
+            ),
+        )
+
+    def get_table(self, query: dict, version: str) -> pd.DataFrame:
+        """
+        Returns the filtered results of a normalized /screen query.
+        """
+        key = (json.dumps(query, sort_keys=True), version)
+
+        def compute():
+            df_scores, df_features = self.get_screen(
+                query["screener_parameters"], version
+            )
+            df = df_features if query["table"] == "features" else df_scores
+            return filter_results(df, query)
+
+        return self._cached(self._tables, key, compute)
+
+    def get_body(self, query: dict, version: str) -> bytes:
+        """
+        Returns the encoded JSON body of a normalized /tickers or /facets query.
+        """
+        df = self.get_table(query, version)
+        if query["endpoint"] == "facets":
+            facets = {
+                col: df[col].value_counts().to_dict()
+                for col in FACET_COLUMNS
+                if col in df.columns
+            }
+            return json.dumps({"version": version, "facets": facets}).encode()
+        tickers = df["ticker"].tolist() if "ticker" in df.columns else []
+        return json.dumps({"version": version, "tickers": tickers}).encode()
+
+
+def filter_results(df: pd.DataFrame, query: dict) -> pd.DataFrame:
+    """
+    Applies the min_score, tickers and facet filters of a query.
+    """
+    if df.empty:
+        return df
+    if gv.SCORE in df.columns:
+        df = df[df[gv.SCORE] >= query["min_score"]]
+    if query["tickers"]:
+        df = df[df["ticker"].isin(query["tickers"])]
+    for col in FACET_COLUMNS:
+        values = query["facets"].get(col)
+        if values and col in df.columns:
+            df = df[df[col].isin(values)]
+    return df
+
+
+def encode_dataframe(
+    df: pd.DataFrame, output_format: str, chunk_rows: int = CHUNK_ROWS
+) -> Iterator[bytes]:
+    """
+    Encodes the DataFrame block by block of chunk_rows rows, so that large results
+    are sent while they are being encoded instead of being built in memory first.
+    """
+    if output_format == FORMAT_ARROW:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=chunk_rows):
+                writer.write_batch(batch)
+                yield _drain(sink)
+        yield _drain(sink)
+        return
+
+    if output_format == FORMAT_JSON:
+        yield b"["
+    for start in range(0, max(len(df), 1), chunk_rows):
+        block = df.iloc[start : start + chunk_rows]
+        if output_format == FORMAT_CSV:
+            yield block.to_csv(index=False, header=start == 0).encode()
+        elif not block.empty:
+            records = block.to_json(orient="records")[1:-1]
+            yield (records if start == 0 else "," + records).encode()
+    if output_format == FORMAT_JSON:
+        yield b"]"
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def parse_query(path: str) -> dict:
+    """
+    Turns a request path into a normalized query dictionary.
+    Raises ValueError for invalid parameters.
+    """
+    url = urlparse(path)
+    params = parse_qs(url.query)
+
+    def get_list(name: str) -> list[str]:
+        values = []
+        for value in params.get(name, []):
+            values.extend(v.strip() for v in value.split(",") if v.strip())
+        return sorted(set(values))
+
+    def get_int(name: str, default: int) -> int:
+        try:
+            return int(params.get(name, [default])[0])
+        except ValueError:
+            raise ValueError(f"'{name}' must be an integer")
+
+    endpoint = url.path.strip("/") or "screen"
+    if endpoint not in ("screen", "tickers", "facets"):
+        raise LookupError(f"unknown endpoint '{endpoint}'")
+    output_format = params.get("format", [FORMAT_JSON])[0]
+    if output_format not in CONTENT_TYPES:
+        raise ValueError(f"'format' must be one of {', '.join(CONTENT_TYPES)}")
+    table = params.get("table", ["scores"])[0]
+    if table not in ("scores", "features"):
+        raise ValueError("'table' must be 'scores' or 'features'")
+
+    screener_parameters = {
+        gv.FCF_YEARS: get_int(gv.FCF_YEARS, 3),
+        gv.OCF_YEARS: get_int(gv.OCF_YEARS, 3),
+    }
+    if gv.TREND_YEARS in params:
+        screener_parameters[gv.TREND_YEARS] = get_int(gv.TREND_YEARS, 0)
+
+    return {
+        "endpoint": endpoint,
+        "format": output_format if endpoint == "screen" else FORMAT_JSON,
+        "table": table,
+        "screener_parameters": screener_parameters,
+        "min_score": get_int("min_score", 0),
+        "tickers": get_list("tickers"),
+        "facets": {col: get_list(col.lower()) for col in FACET_COLUMNS},
+    }
+
+
+class ScreenerRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        try:
+            query = parse_query(self.path)
+        except LookupError as e:
+            return self._send_error(404, str(e))
+        except ValueError as e:
+            return self._send_error(400, str(e))
+        if query["format"] == FORMAT_ARROW and pa is None:
+            return self._send_error(406, "Arrow output requires pyarrow")
+
+        version = self.service.get_version()
+        etag = '"{}"'.format(
+            hashlib.sha1(
+                (json.dumps(query, sort_keys=True) + version).encode()
+            ).hexdigest()
+        )
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        try:
+            if query["endpoint"] == "screen":
+                df = self.service.get_table(query, version)
+                chunks = encode_dataframe(df, query["format"])
+            else:
+                chunks = [self.service.get_body(query, version)]
+        except Exception as e:
+            return self._send_error(500, f"error computing results: {e}")
+
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[query["format"]])
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        if query["endpoint"] != "screen" and len(chunks[0]) < GZIP_MIN_SIZE:
+            self.send_header("Content-Length", str(len(chunks[0])))
+            self.end_headers()
+            self.wfile.write(chunks[0])
+            return
+
+        # the size is not known in advance: send chunks as they are encoded
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        compressor = zlib.compressobj(wbits=31) if use_gzip else None
+        for chunk in chunks:
+            self._write_chunk(compressor.compress(chunk) if use_gzip else chunk)
+        if use_gzip:
+            self._write_chunk(compressor.flush())
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data: bytes):
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
+    def _send_error(self, status: int, message: str):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPES[FORMAT_JSON])
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8502) -> ThreadingHTTPServer:
+    handler = type(
+        "Handler", (ScreenerRequestHandler,), {"service": ScreenerQueryService()}
+    )
+    # chunked responses need HTTP/1.1
+    handler.protocol_version = "HTTP/1.1"
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP API for screener results.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port)
+    print(f"Serving screener results on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
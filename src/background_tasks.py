@@ -0,0 +1,70 @@
+import threading
+import traceback
+from typing import Callable
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a task by its progress callback once cancellation was requested.
+    """
+
+
+class BackgroundTask:
+    """
+    Runs a long job in a daemon thread with pollable progress and cancellation.
+
+    The target is called as target(*args, progress_callback=callback, **kwargs).
+    The callback accepts a progress between 0 and 1 and raises TaskCancelled
+    when cancel() was called, so the job stops at its next progress update.
+    """
+
+    def __init__(self, name: str, target: Callable, *args, **kwargs):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.status = PENDING
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.status in (PENDING, RUNNING)
+
+    def start(self) -> "BackgroundTask":
+        self.status = RUNNING
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def _update_progress(self, progress: float):
+        if self._cancel_event.is_set():
+            raise TaskCancelled(self.name)
+        self.progress = min(max(progress, 0.0), 1.0)
+
+    def _run(self):
+        try:
+            self.result = self.target(
+                *self.args, progress_callback=self._update_progress, **self.kwargs
+            )
+            self.progress = 1.0
+            self.status = DONE
+        except TaskCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            print(f"Error in background task {self.name}: {e}")
+            traceback.print_exc()
+            self.error = str(e)
+            self.status = FAILED
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import List
+
+from src.finviz.finviz_screener import get_df_with_all_tickers_information
+from src.fmp.fmp_cashflow import (
+    FCF_LABELS,
+    OCF_LABELS,
+    align_cashflow_years,
+    is_cashflow_increasing,
+    recent_cashflow_values,
+)
+from src.fmp.fmp_panel import StatementPanel, get_statement_panel
+from src.fmp.fmp_shared_panel import attach_shared_panel
+from src.fmp.fmp_trend import compute_trend_features
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+from src.utils import (
+    add_derived_metrics,
+    calculate_score,
+    reorder_dataframes_columns,
+)
+import src.global_variables as gv
+
+TREND_CRITERIA = {
+    gv.FCF_YEARS: (fmp_gv.freeCashFlow, fmp_gv.increasing_fcf_condition, FCF_LABELS),
+    gv.OCF_YEARS: (
+        fmp_gv.operative_cash_flow,
+        fmp_gv.increasing_ocf_condition,
+        OCF_LABELS,
+    ),
+}
+
+
+def load_screens(screens_dir: str = gv.SCREENS_DIR) -> List[dict]:
+    """
+    Loads the saved screen definitions (one JSON file per screen), e.g.:
+        {"name": "tech_growth", "fcf_years": 4, "ocf_years": 3, "min_score": 2,
+         "sectors": ["Technology"]}
+    'sectors', 'industries' and 'countries' are optional restrictions, 'trend_years'
+    adds the regression trend criteria and 'score_weights' weights its continuous
+    columns in the score.
+    """
+    screens = []
+    for file_name in sorted(os.listdir(screens_dir)):
+        if not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(screens_dir, file_name), "r") as f:
+            screen = json.load(f)
+        screen.setdefault("name", os.path.splitext(file_name)[0])
+        screens.append(screen)
+    return screens
+
+
+class ScreenBatch:
+    """
+    Evaluates many screens over one shared statement panel and universe table.
+
+    Trend criteria are computed vectorized for all tickers and memoized by
+    (field, years), so screens sharing a parameter reuse the same result.
+    """
+
+    def __init__(self, panel: StatementPanel, df_info_stocks: pd.DataFrame):
+        self.panel = panel
+        self.df_info_stocks = df_info_stocks
+        has_cashflow = ~np.all(
+            np.isnan(panel.field(fmp_gv.freeCashFlow))
+            & np.isnan(panel.field(fmp_gv.operative_cash_flow)),
+            axis=1,
+        )
+        self.rows = np.flatnonzero(has_cashflow)
+        self.tickers = [panel.tickers[i] for i in self.rows]
+        self.cashflow = align_cashflow_years(panel, self.rows)
+        self._criteria = {}
+        self._trends = {}
+        self._derived_metrics = None
+
+    def increasing_trend(self, field: str, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized FmpDataCashFlow.is_free_cashflow_increasing, with the same
+        criterion and the same cash flow years per ticker.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The boolean criterion per ticker and the
+                (n_tickers, n) values used for it.
+        """
+        n = min(n, 4)
+        key = (field, n)
+        if key in self._criteria:
+            return self._criteria[key]
+        if n < 2:
+            self._criteria[key] = (np.zeros(len(self.rows), dtype=bool), None)
+            return self._criteria[key]
+
+        values = recent_cashflow_values(self.cashflow[field], n)
+        self._criteria[key] = (is_cashflow_increasing(values), values)
+        return self._criteria[key]
+
+    def derived_metrics(self) -> pd.DataFrame:
+        """
+        Derived metrics of the screened tickers, loaded once for all screens.
+        """
+        if self._derived_metrics is None:
+            self._derived_metrics = add_derived_metrics(
+                pd.DataFrame({"ticker": self.tickers})
+            )
+        return self._derived_metrics
+
+    def trend_features(self, n: int) -> pd.DataFrame:
+        """
+        Regression trend features of the screened tickers, memoized by years.
+        """
+        if n not in self._trends:
+            self._trends[n] = compute_trend_features(self.panel, n, self.tickers)
+        return self._trends[n]
+
+    def evaluate(self, screen: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Evaluates one screen definition.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: df_scores and df_features like
+                process_tickers, filtered by the screen restrictions and min_score.
+        """
+        df_scores = pd.DataFrame({"ticker": self.tickers})
+        df_features = pd.DataFrame({"ticker": self.tickers})
+        for param, (field, condition, labels) in TREND_CRITERIA.items():
+            criterion, values = self.increasing_trend(field, screen.get(param, 3))
+            df_scores[condition] = criterion
+            if values is not None:
+                for label, column in zip(labels[-values.shape[1] :], values.T):
+                    df_features[label] = column
+
+        if screen.get(gv.TREND_YEARS):
+            df_trends = self.trend_features(screen[gv.TREND_YEARS])
+            weights = screen.get(gv.SCORE_WEIGHTS) or {}
+            for col in df_trends.columns.drop("ticker"):
+                if df_trends[col].dtype == bool or col in weights:
+                    df_scores[col] = df_trends[col].to_numpy()
+                if df_trends[col].dtype != bool:
+                    df_features[col] = df_trends[col].to_numpy()
+
+        df_scores = calculate_score(df_scores, weights=screen.get(gv.SCORE_WEIGHTS))
+        df_features[gv.SCORE] = df_scores[gv.SCORE]
+        df_features = pd.merge(
+            df_features, self.derived_metrics(), on="ticker", how="left"
+        )
+        df_scores = pd.merge(
+            df_scores,
+            self.df_info_stocks,
+            left_on="ticker",
+            right_on="Ticker",
+            how="left",
+        )
+        df_features = pd.merge(
+            df_features,
+            self.df_info_stocks,
+            left_on="ticker",
+            right_on="Ticker",
+            how="left",
+        )
+        df_scores, df_features = reorder_dataframes_columns(
+            df_scores, df_features, self.df_info_stocks
+        )
+
+        keep = df_scores[gv.SCORE] >= screen.get("min_score", 0)
+        for key, col in (
+            ("sectors", "Sector"),
+            ("industries", "Industry"),
+            ("countries", "Country"),
+        ):
+            if screen.get(key):
+                keep &= df_scores[col].isin(screen[key])
+        df_scores = df_scores[keep].sort_values(by=gv.SCORE, ascending=False)
+        df_features = df_features[keep].sort_values(by=gv.SCORE, ascending=False)
+        return df_scores, df_features
+
+
+def run_screens(
+    screens: List[dict] | None = None, output_dir: str = gv.SCREEN_RESULTS_DIR
+) -> dict:
+    """
+    Loads the statement data and the universe once, evaluates all screens and writes
+    <name>_scores.csv and <name>_features.csv per screen to output_dir.
+
+    Returns:
+        dict: {screen name: df_scores}.
+    """
+    if screens is None:
+        screens = load_screens()
+    panel = attach_shared_panel()
+    if panel is None:
+        panel = get_statement_panel()
+    batch = ScreenBatch(panel, get_df_with_all_tickers_information())
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    for screen in screens:
+        df_scores, df_features = batch.evaluate(screen)
+        df_scores.to_csv(
+            os.path.join(output_dir, f"{screen['name']}_scores.csv"), index=False
+        )
+        df_features.to_csv(
+            os.path.join(output_dir, f"{screen['name']}_features.csv"), index=False
+        )
+        results[screen["name"]] = df_scores
+        print(f"Screen '{screen['name']}': {len(df_scores)} tickers.")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate all saved screens at once.")
+    parser.add_argument("--screens-dir", default=gv.SCREENS_DIR)
+    parser.add_argument("--output-dir", default=gv.SCREEN_RESULTS_DIR)
+    args = parser.parse_args()
+
+    run_screens(load_screens(args.screens_dir), output_dir=args.output_dir)
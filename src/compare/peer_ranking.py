@@ -0,0 +1,209 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from src.finviz.finviz_screener import get_df_with_all_tickers_information
+from src.fmp.fmp_cashflow import align_cashflow_years
+from src.fmp.fmp_panel import (
+    StatementPanel,
+    get_data_version,
+    get_statement_panel,
+    growth_over_years,
+)
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+from src.yfinance.yfinance_refresher import load_cached_metrics
+import src.global_variables as gv
+
+PEER_GROUPS = ["Industry", "Sector"]
+PEER_METRICS = [
+    gv.FCF_GROWTH,
+    gv.OCF_GROWTH,
+    gv.ENTERPRISE_TO_EBITDA,
+    gv.P_E_RATIO,
+]
+# YahooFinanceTickerInfo returns these values when the ratio is not available
+P_E_RATIO_MISSING_THRESHOLD = 10000
+# the rankings are rebuilt with the newest cached P/E and EV/EBITDA after this long
+MARKET_DATA_TTL = 3600
+# number of (data version, parameters) rankings kept, shared by all sessions
+CACHE_SIZE = 4
+
+_PEER_RANKING_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+class PeerRanking:
+    """
+    Percentile of each metric of each ticker within its finviz Industry and Sector,
+    together with the aggregates (count, quartiles) of every peer group.
+
+    df_percentiles is indexed by ticker and contains, for every metric, the raw value
+    and one '<metric> <group> pct' column per peer group (0-1, higher means a higher
+    value of the metric than the peers). group_stats maps each peer group column to
+    a DataFrame of aggregates indexed by group name.
+    """
+
+    def __init__(self, df_percentiles: pd.DataFrame, group_stats: dict):
+        self.df_percentiles = df_percentiles
+        self.group_stats = group_stats
+
+    @property
+    def tickers(self) -> list[str]:
+        return self.df_percentiles.index.tolist()
+
+    def get_ticker_comparison(self, ticker: str) -> pd.DataFrame:
+        """
+        Returns one row per metric with the ticker value, its percentiles and the
+        median of its peer groups. Only index lookups are performed.
+        """
+        row = self.df_percentiles.loc[ticker]
+        comparison = []
+        for metric in PEER_METRICS:
+            if metric not in self.df_percentiles.columns:
+                continue
+            metric_row = {"metric": metric, "value": row[metric]}
+            for group in PEER_GROUPS:
+                group_name = row[group]
+                metric_row[f"{group} pct"] = row[percentile_column(metric, group)]
+                stats = self.group_stats[group]
+                median_col = (metric, "median")
+                metric_row[f"{group} median"] = (
+                    stats.at[group_name, median_col]
+                    if pd.notnull(group_name) and group_name in stats.index
+                    else np.nan
+                )
+            comparison.append(metric_row)
+        return pd.DataFrame(comparison).set_index("metric")
+
+    def get_peers(self, ticker: str, group: str = "Industry") -> pd.DataFrame:
+        """
+        Returns the rows of all tickers in the same peer group as ticker.
+        """
+        group_name = self.df_percentiles.at[ticker, group]
+        return self.df_percentiles[self.df_percentiles[group] == group_name]
+
+
+def percentile_column(metric: str, group: str) -> str:
+    return f"{metric} {group} pct"
+
+
+def build_peer_metrics(
+    panel: StatementPanel,
+    fcf_years: int = 3,
+    ocf_years: int = 3,
+    df_market: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Builds the metrics compared within peer groups, indexed by ticker.
+
+    FCF and OCF growth are computed from the cash flow years of the statement panel
+    for the whole universe.
+    P/E and EV/EBITDA come from df_market (raw YahooFinanceTickerInfo metrics with a
+    'ticker' column, e.g. load_cached_metrics for the whole universe) and are NaN for
+    tickers without current data.
+    """
+    # growth over the cash flow years of each ticker, even when its income
+    # statement already reports a later year
+    cashflow = align_cashflow_years(panel, np.arange(len(panel)))
+    df_metrics = pd.DataFrame(
+        {
+            gv.FCF_GROWTH: growth_over_years(cashflow[fmp_gv.freeCashFlow], fcf_years),
+            gv.OCF_GROWTH: growth_over_years(
+                cashflow[fmp_gv.operative_cash_flow], ocf_years
+            ),
+        },
+        index=pd.Index(panel.tickers, name="ticker"),
+    )
+
+    market_cols = [gv.ENTERPRISE_TO_EBITDA, gv.P_E_RATIO]
+    if df_market is not None and not df_market.empty:
+        df_market = df_market.drop_duplicates("ticker").set_index("ticker")
+        for col in market_cols:
+            if col in df_market.columns:
+                df_metrics[col] = pd.to_numeric(df_market[col], errors="coerce")
+    for col in market_cols:
+        if col not in df_metrics.columns:
+            df_metrics[col] = np.nan
+
+    # default values returned by YahooFinanceTickerInfo when the data is missing
+    df_metrics.loc[
+        df_metrics[gv.P_E_RATIO] >= P_E_RATIO_MISSING_THRESHOLD, gv.P_E_RATIO
+    ] = np.nan
+    df_metrics.loc[
+        df_metrics[gv.ENTERPRISE_TO_EBITDA] == 0, gv.ENTERPRISE_TO_EBITDA
+    ] = np.nan
+    return df_metrics
+
+
+def build_peer_ranking(
+    df_metrics: pd.DataFrame, df_info_stocks: pd.DataFrame
+) -> PeerRanking:
+    """
+    Computes percentiles and group aggregates with one vectorized groupby per
+    peer group.
+
+    Args:
+        df_metrics (pd.DataFrame): Metrics indexed by ticker (see build_peer_metrics).
+        df_info_stocks (pd.DataFrame): finviz universe with 'Ticker' and peer group columns.
+
+    Returns:
+        PeerRanking: The percentiles and group aggregates.
+    """
+    df_groups = df_info_stocks.drop_duplicates("Ticker").set_index("Ticker")[
+        PEER_GROUPS
+    ]
+    df = df_metrics.join(df_groups, how="left")
+    metrics = [m for m in PEER_METRICS if m in df.columns]
+
+    group_stats = {}
+    for group in PEER_GROUPS:
+        grouped = df.groupby(group)[metrics]
+        ranks = grouped.rank(pct=True)
+        for metric in metrics:
+            df[percentile_column(metric, group)] = ranks[metric]
+        group_stats[group] = grouped.agg(
+            [
+                "count",
+                "median",
+                lambda x: x.quantile(0.25),
+                lambda x: x.quantile(0.75),
+            ]
+        ).rename(columns={"<lambda_0>": "q25", "<lambda_1>": "q75"})
+
+    return PeerRanking(df, group_stats)
+
+
+def get_peer_ranking(
+    fcf_years: int = 3,
+    ocf_years: int = 3,
+    data_version: str | None = None,
+) -> PeerRanking:
+    """
+    Returns the PeerRanking of the whole universe, computing it only once per
+    (data version, parameters) combination.
+
+    P/E and EV/EBITDA are read for the whole universe from the YahooQuoteRefresher
+    cache, so every ticker is ranked against all its peers with current data; they
+    are reread at most every MARKET_DATA_TTL seconds.
+    """
+    if data_version is None:
+        data_version = get_data_version()
+    key = (data_version, fcf_years, ocf_years)
+
+    cached = _PEER_RANKING_CACHE.get(key)
+    if cached is not None and time.time() - cached[1] <= MARKET_DATA_TTL:
+        return cached[0]
+
+    panel = get_statement_panel(data_version)
+    df_market = load_cached_metrics(list(panel.tickers))
+    df_metrics = build_peer_metrics(panel, fcf_years, ocf_years, df_market)
+    ranking = build_peer_ranking(df_metrics, get_df_with_all_tickers_information())
+    # sessions share the cache: other entries may be evicted concurrently, so the
+    # computed ranking is returned rather than read back
+    with _CACHE_LOCK:
+        _PEER_RANKING_CACHE.pop(key, None)
+        _PEER_RANKING_CACHE[key] = (ranking, time.time())
+        while len(_PEER_RANKING_CACHE) > CACHE_SIZE:
+            _PEER_RANKING_CACHE.pop(next(iter(_PEER_RANKING_CACHE)))
+    return ranking
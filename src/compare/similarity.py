@@ -0,0 +1,295 @@
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from typing import List
+
+from src.fmp.fmp_panel import (
+    StatementPanel,
+    load_statement_panel,
+    scan_statement_signatures,
+)
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+import src.global_variables as gv
+
+PROFILE_FIELDS = [
+    fmp_gv.freeCashFlow,
+    fmp_gv.operative_cash_flow,
+    fmp_gv.revenue,
+]
+COSINE = "cosine"
+EUCLIDEAN = "euclidean"
+# number of index rows scored at once, bounds the memory used by batched queries
+DEFAULT_BLOCK_SIZE = 16384
+
+_INDEX_CACHE = {}
+# serializes the refresh and save of the index shared by all sessions
+_INDEX_LOCK = threading.Lock()
+
+
+def build_profile_vectors(panel: StatementPanel) -> tuple[List[str], np.ndarray]:
+    """
+    Builds one trajectory vector per ticker from the FCF, OCF and revenue history.
+
+    Each field is divided by its largest absolute value over the panel years, so the
+    vector describes the shape of the trajectory and not the size of the company.
+    Missing years are set to 0. Tickers without any data are left out.
+
+    Returns:
+        tuple[List[str], np.ndarray]: The tickers and the (n_tickers, n_features) vectors.
+    """
+    blocks = []
+    for field in PROFILE_FIELDS:
+        values = panel.field(field)
+        with np.errstate(invalid="ignore"):
+            scale = np.nanmax(np.abs(values), axis=1, keepdims=True)
+        scale[~np.isfinite(scale) | (scale == 0)] = 1.0
+        blocks.append(values / scale)
+    vectors = np.concatenate(blocks, axis=1)
+
+    has_data = ~np.all(np.isnan(vectors), axis=1)
+    vectors = np.nan_to_num(vectors[has_data], nan=0.0).astype(np.float32)
+    tickers = [t for t, keep in zip(panel.tickers, has_data) if keep]
+    return tickers, vectors
+
+
+class CashFlowProfileIndex:
+    """
+    Exact nearest-neighbour index over cash flow trajectory vectors.
+
+    Vectors are kept in a contiguous float32 array together with their unit-norm
+    version and squared norms, so a query is a single matrix product per block.
+    """
+
+    def __init__(
+        self, tickers: List[str], vectors: np.ndarray, signatures: dict | None = None
+    ):
+        self.tickers = list(tickers)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.signatures = signatures or {}
+        self._ticker_index = {t: i for i, t in enumerate(self.tickers)}
+        self._update_norms()
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def _update_norms(self):
+        self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        norms = np.sqrt(self.sq_norms)
+        norms[norms == 0] = 1.0
+        self.unit_vectors = self.vectors / norms[:, None]
+
+    @classmethod
+    def build(cls, tickers: List[str] | None = None) -> "CashFlowProfileIndex":
+        """
+        Builds the index for the given tickers (all available tickers by default).
+        """
+        signatures = scan_statement_signatures(tickers)
+        panel = load_statement_panel(list(signatures))
+        index_tickers, vectors = build_profile_vectors(panel)
+        return cls(index_tickers, vectors, signatures)
+
+    def refresh(self, signatures: dict | None = None) -> "CashFlowProfileIndex":
+        """
+        Returns the index updated for the current data, re-reading only the tickers
+        whose statement files were added, changed or removed since the index was
+        built. The index itself is never modified, so it can be queried meanwhile.
+
+        Args:
+            signatures (dict | None): Current {ticker: signature} index. Scanned from
+                                      disk if not given.
+        Returns:
+            CashFlowProfileIndex: A new index, or self if nothing changed.
+        """
+        if signatures is None:
+            signatures = scan_statement_signatures()
+        changed = [t for t, sig in signatures.items() if self.signatures.get(t) != sig]
+        removed = set(self.signatures) - set(signatures)
+        if not changed and not removed:
+            return self
+
+        panel = load_statement_panel(changed)
+        new_tickers, new_vectors = build_profile_vectors(panel)
+        # changed tickers which no longer have data are removed as well
+        removed |= set(changed) - set(new_tickers)
+
+        keep = [i for i, t in enumerate(self.tickers) if t not in removed]
+        tickers = [self.tickers[i] for i in keep]
+        # a copy: the rows of this index are left untouched
+        vectors = self.vectors[keep]
+        positions = {t: i for i, t in enumerate(tickers)}
+
+        replace_rows = [positions[t] for t in new_tickers if t in positions]
+        replace_mask = np.array([t in positions for t in new_tickers], dtype=bool)
+        if replace_rows:
+            vectors[replace_rows] = new_vectors[replace_mask]
+        appended = [t for t in new_tickers if t not in positions]
+        vectors = np.concatenate([vectors, new_vectors[~replace_mask]])
+
+        print(
+            f"Similarity index refreshed: {len(changed)} changed, {len(removed)} removed."
+        )
+        return CashFlowProfileIndex(tickers + appended, vectors, dict(signatures))
+
+    def _scores(self, queries: np.ndarray, rows: slice, metric: str) -> np.ndarray:
+        """
+        Returns a (n_queries, n_rows) score matrix, higher is more similar.
+        """
+        if metric == COSINE:
+            q_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            q_norms[q_norms == 0] = 1.0
+            return (queries / q_norms) @ self.unit_vectors[rows].T
+        if metric == EUCLIDEAN:
+            q_sq_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+            sq_dist = (
+                q_sq_norms
+                - 2.0 * queries @ self.vectors[rows].T
+                + self.sq_norms[rows][None, :]
+            )
+            return -np.sqrt(np.maximum(sq_dist, 0.0))
+        raise ValueError(f"Unknown metric '{metric}', use '{COSINE}' or '{EUCLIDEAN}'.")
+
+    def query_vectors(
+        self,
+        queries: np.ndarray,
+        k: int = 20,
+        metric: str = COSINE,
+        exclude: List[int] | None = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the k most similar index rows for each query vector.
+
+        The index is scanned in blocks of block_size rows, keeping the best k rows of
+        each block, so memory stays bounded for large batches.
+
+        Args:
+            queries (np.ndarray): (n_queries, n_features) array.
+            k (int): Number of neighbours per query.
+            metric (str): 'cosine' (similarity) or 'euclidean' (negated distance).
+            exclude (List[int] | None): Index row to skip for each query, e.g. the
+                                        query ticker itself. -1 to skip nothing.
+            block_size (int): Number of index rows scored at once.
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (n_queries, k) row positions and scores,
+                best first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n_queries = queries.shape[0]
+        k = min(k, len(self))
+        best_rows = np.empty((n_queries, 0), dtype=int)
+        best_scores = np.empty((n_queries, 0), dtype=np.float32)
+
+        for start in range(0, len(self), block_size):
+            rows = slice(start, min(start + block_size, len(self)))
+            scores = self._scores(queries, rows, metric)
+            if exclude is not None:
+                for q, row in enumerate(exclude):
+                    if rows.start <= row < rows.stop:
+                        scores[q, row - rows.start] = -np.inf
+            block_k = min(k, scores.shape[1])
+            top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            best_scores = np.concatenate(
+                [best_scores, np.take_along_axis(scores, top, axis=1)], axis=1
+            )
+            if best_rows.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return (
+            np.take_along_axis(best_rows, order, axis=1),
+            np.take_along_axis(best_scores, order, axis=1),
+        )
+
+    def query(self, ticker: str, k: int = 20, metric: str = COSINE) -> pd.DataFrame:
+        """
+        Returns the k tickers whose cash flow trajectory is most similar to ticker.
+
+        Returns:
+            pd.DataFrame: Columns 'ticker' and 'similarity' (cosine similarity, or the
+                negated euclidean distance), most similar first.
+        """
+        if ticker not in self._ticker_index:
+            print(f"Warning: no cash flow profile available for {ticker}.")
+            return pd.DataFrame(columns=["ticker", gv.SIMILARITY])
+        row = self._ticker_index[ticker]
+        rows, scores = self.query_vectors(
+            self.vectors[row], k=k, metric=metric, exclude=[row]
+        )
+        rows, scores = rows[0], scores[0]
+        valid = np.isfinite(scores)
+        return pd.DataFrame(
+            {
+                "ticker": [self.tickers[i] for i in rows[valid]],
+                gv.SIMILARITY: scores[valid],
+            }
+        )
+
+    def save(self, file_path: str = gv.SIMILARITY_INDEX_FILE):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # own temporary file, so that concurrent saves never clash
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(file_path), suffix=".tmp.npz"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    tickers=np.array(self.tickers),
+                    vectors=self.vectors,
+                    signatures=np.array(json.dumps(self.signatures)),
+                )
+            os.replace(tmp_file, file_path)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    @classmethod
+    def load(
+        cls, file_path: str = gv.SIMILARITY_INDEX_FILE
+    ) -> "CashFlowProfileIndex | None":
+        if not os.path.exists(file_path):
+            return None
+        with np.load(file_path) as data:
+            signatures = {
+                t: tuple(tuple(s) if s is not None else None for s in sig)
+                for t, sig in json.loads(str(data["signatures"])).items()
+            }
+            return cls(data["tickers"].tolist(), data["vectors"], signatures)
+
+
+def get_profile_index(data_version: str | None = None) -> CashFlowProfileIndex:
+    """
+    Returns the similarity index for the current data, loading the saved index and
+    refreshing only the changed tickers. The refreshed index is saved back to disk.
+    Sessions still querying the previous index keep using it unchanged.
+    """
+    index = _INDEX_CACHE.get(data_version) if data_version is not None else None
+    if index is not None:
+        return index
+
+    with _INDEX_LOCK:
+        # another session may have refreshed it while this one waited
+        index = _INDEX_CACHE.get(data_version) if data_version is not None else None
+        if index is not None:
+            return index
+        index = next(iter(_INDEX_CACHE.values()), None) or CashFlowProfileIndex.load()
+        if index is None:
+            index = CashFlowProfileIndex.build()
+            index.save()
+        else:
+            refreshed = index.refresh()
+            if refreshed is not index:
+                index = refreshed
+                index.save()
+
+        _INDEX_CACHE.clear()
+        if data_version is not None:
+            _INDEX_CACHE[data_version] = index
+    return index
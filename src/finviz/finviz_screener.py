@@ -1,17 +1,60 @@
 from finvizfinance.screener.overview import Overview
 import pandas as pd
+import json
+import os
+from datetime import datetime
 
-from src.global_variables import ALL_STOCKS_INFO_FILE
+from src.global_variables import (
+    ALL_STOCKS_INFO_FILE,
+    UNIVERSE_DIFF_FILE,
+    UNIVERSE_SNAPSHOTS_DIR,
+    TICKER_INFO_COLUMNS,
+    TICKER_CLASSIFICATION_COLUMNS,
+    ADDED_TICKERS,
+    REMOVED_TICKERS,
+    CHANGED_TICKERS,
+)
 
+SNAPSHOT_PREFIX = "all_stocks_tickers_"
+# number of universe snapshots kept on disk, each with its diff: consumers whose
+# cursor is older than all of them get every ticker (see load_universe_diff)
+KEEP_UNIVERSE_SNAPSHOTS = 30
 
-def get_all_ticker_from_finviz():
+
+def get_snapshot_diff_file(snapshot: str) -> str:
+    return os.path.join(
+        UNIVERSE_SNAPSHOTS_DIR, f"{os.path.splitext(snapshot)[0]}.diff.json"
+    )
+
+
+def list_universe_snapshots() -> list[str]:
+    """
+    Returns the snapshot file names, oldest first.
+    """
+    if not os.path.isdir(UNIVERSE_SNAPSHOTS_DIR):
+        return []
+    return sorted(
+        f
+        for f in os.listdir(UNIVERSE_SNAPSHOTS_DIR)
+        if f.startswith(SNAPSHOT_PREFIX) and f.endswith(".csv")
+    )
+
+
+def get_all_ticker_from_finviz() -> dict | None:
+    """
+    Downloads the current ticker universe from finviz, stores it as a new versioned
+    snapshot and computes the diff against the previously published universe.
+
+    The latest snapshot is also written to ALL_STOCKS_INFO_FILE so existing readers
+    keep working, and the diff is saved next to the snapshot (see load_universe_diff).
+
+    Returns:
+        dict | None: The universe diff (see compute_universe_diff), or None on error.
+    """
     try:
         foverview = Overview()
         ticker_list = foverview.screener_view(order="Ticker")
-        desired_columns = ["Ticker", "Company", "Sector", "Industry", "Country"]
-        ticker_list = ticker_list[desired_columns]
-
-        ticker_list.to_csv(ALL_STOCKS_INFO_FILE, index=False)
+        ticker_list = ticker_list[TICKER_INFO_COLUMNS]
         print(f"Found {len(ticker_list)} tickers (sample): {ticker_list.head(10)}")
 
     except Exception as e:
@@ -19,6 +62,231 @@ def get_all_ticker_from_finviz():
         print(
             "Note: finvizfinance relies on scraping and might require updates if Finviz changes."
         )
+        return None
+
+    return publish_universe_snapshot(ticker_list)
+
+
+def publish_universe_snapshot(df_universe: pd.DataFrame) -> dict:
+    """
+    Saves df_universe as a timestamped snapshot, diffs it against the current
+    universe file and then replaces the current universe file.
+
+    Every snapshot keeps its own diff file, so consumers applying the diffs later
+    (see load_universe_diff) do not miss the changes of intermediate refreshes. Only
+    the last KEEP_UNIVERSE_SNAPSHOTS snapshots and their diffs are kept.
+
+    Args:
+        df_universe (pd.DataFrame): New universe with the TICKER_INFO_COLUMNS columns.
+
+    Returns:
+        dict: The universe diff, also saved to UNIVERSE_DIFF_FILE (last refresh only).
+    """
+    os.makedirs(UNIVERSE_SNAPSHOTS_DIR, exist_ok=True)
+
+    if os.path.exists(ALL_STOCKS_INFO_FILE):
+        df_previous = get_df_with_all_tickers_information()
+    else:
+        df_previous = pd.DataFrame(columns=TICKER_INFO_COLUMNS)
+
+    # microseconds keep the snapshot names unique and sortable
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    snapshot_file = os.path.join(
+        UNIVERSE_SNAPSHOTS_DIR, f"{SNAPSHOT_PREFIX}{timestamp}.csv"
+    )
+    df_universe.to_csv(snapshot_file, index=False)
+
+    diff = compute_universe_diff(df_previous, df_universe)
+    diff["date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    diff["snapshot"] = os.path.basename(snapshot_file)
+
+    # write to a temporary file first so readers never see a half written universe
+    tmp_file = f"{ALL_STOCKS_INFO_FILE}.tmp"
+    df_universe.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, ALL_STOCKS_INFO_FILE)
+
+    with open(get_snapshot_diff_file(diff["snapshot"]), "w") as f:
+        json.dump(diff, f, indent=4)
+    with open(UNIVERSE_DIFF_FILE, "w") as f:
+        json.dump(diff, f, indent=4)
+
+    for old_snapshot in list_universe_snapshots()[:-KEEP_UNIVERSE_SNAPSHOTS]:
+        # the CSV first: a diff left without its snapshot is never listed
+        for old_file in (
+            os.path.join(UNIVERSE_SNAPSHOTS_DIR, old_snapshot),
+            get_snapshot_diff_file(old_snapshot),
+        ):
+            try:
+                os.remove(old_file)
+            except FileNotFoundError:
+                pass
+
+    print(
+        f"Universe snapshot {diff['snapshot']}: "
+        f"{len(diff[ADDED_TICKERS])} added, "
+        f"{len(diff[REMOVED_TICKERS])} removed, "
+        f"{len(diff[CHANGED_TICKERS])} changed."
+    )
+    return diff
+
+
+def compute_universe_diff(df_old: pd.DataFrame, df_new: pd.DataFrame) -> dict:
+    """
+    Computes the difference between two universe tables.
+
+    Args:
+        df_old (pd.DataFrame): Previous universe (must contain a 'Ticker' column).
+        df_new (pd.DataFrame): New universe (must contain a 'Ticker' column).
+
+    Returns:
+        dict: A dictionary with:
+            - "added": tickers only present in df_new.
+            - "removed": tickers only present in df_old (delisted).
+            - "changed": {ticker: {column: [old, new]}} for tickers whose
+              Sector, Industry or Country changed.
+    """
+    class_cols = [
+        col
+        for col in TICKER_CLASSIFICATION_COLUMNS
+        if col in df_old.columns and col in df_new.columns
+    ]
+    df_merged = pd.merge(
+        df_old[["Ticker"] + class_cols].drop_duplicates("Ticker"),
+        df_new[["Ticker"] + class_cols].drop_duplicates("Ticker"),
+        on="Ticker",
+        how="outer",
+        suffixes=("_old", "_new"),
+        indicator=True,
+    )
+
+    added = df_merged.loc[df_merged["_merge"] == "right_only", "Ticker"].tolist()
+    removed = df_merged.loc[df_merged["_merge"] == "left_only", "Ticker"].tolist()
+
+    df_both = df_merged[df_merged["_merge"] == "both"]
+    changed = {}
+    for col in class_cols:
+        old_values = df_both[f"{col}_old"].fillna("")
+        new_values = df_both[f"{col}_new"].fillna("")
+        df_col_changed = df_both[old_values != new_values]
+        for ticker, old, new in zip(
+            df_col_changed["Ticker"],
+            df_col_changed[f"{col}_old"],
+            df_col_changed[f"{col}_new"],
+        ):
+            changed.setdefault(ticker, {})[col] = [
+                None if pd.isnull(old) else old,
+                None if pd.isnull(new) else new,
+            ]
+
+    return {
+        ADDED_TICKERS: sorted(added),
+        REMOVED_TICKERS: sorted(removed),
+        CHANGED_TICKERS: dict(sorted(changed.items())),
+    }
+
+
+def merge_universe_diffs(diffs: list[dict]) -> dict:
+    """
+    Combines consecutive universe diffs (oldest first) into the diff between the
+    universe before the first one and after the last one.
+    """
+    added, removed, changed = set(), set(), {}
+    for diff in diffs:
+        for ticker in diff.get(ADDED_TICKERS, []):
+            removed.discard(ticker)
+            changed.pop(ticker, None)
+            added.add(ticker)
+        for ticker in diff.get(REMOVED_TICKERS, []):
+            added.discard(ticker)
+            changed.pop(ticker, None)
+            removed.add(ticker)
+        for ticker, columns in diff.get(CHANGED_TICKERS, {}).items():
+            if ticker in added:
+                # processed from scratch anyway
+                continue
+            ticker_changes = changed.setdefault(ticker, {})
+            for col, (old, new) in columns.items():
+                # keep the oldest value and the newest one
+                ticker_changes[col] = [ticker_changes.get(col, [old])[0], new]
+
+    merged = {
+        ADDED_TICKERS: sorted(added),
+        REMOVED_TICKERS: sorted(removed),
+        CHANGED_TICKERS: dict(sorted(changed.items())),
+    }
+    if diffs:
+        merged["snapshot"] = diffs[-1].get("snapshot")
+    return merged
+
+
+def load_universe_diff(since_snapshot: str | None = None) -> dict:
+    """
+    Loads the combined diff of all the universe refreshes after since_snapshot.
+
+    Consumers keep the "snapshot" of the returned diff as their cursor and pass it
+    back on the next call, so refreshes happening in between are never lost. If the
+    diffs after the cursor were already deleted (see KEEP_UNIVERSE_SNAPSHOTS), every
+    ticker of the current universe is returned as added.
+
+    Args:
+        since_snapshot (str | None): Last snapshot already applied by the consumer.
+                                     If None, only the diff of the last refresh is
+                                     returned.
+    Returns:
+        dict: The diff dictionary (see compute_universe_diff) with the "snapshot" of
+            the last refresh included. Returns an empty dict if there is no new refresh.
+    """
+    snapshots = list_universe_snapshots()
+    if since_snapshot is None:
+        snapshots = snapshots[-1:]
+    elif snapshots and since_snapshot < snapshots[0]:
+        # the refreshes right after the cursor are unknown: process everything
+        return {
+            ADDED_TICKERS: sorted(get_df_with_all_tickers_information()["Ticker"]),
+            REMOVED_TICKERS: [],
+            CHANGED_TICKERS: {},
+            "snapshot": snapshots[-1],
+        }
+    else:
+        snapshots = [s for s in snapshots if s > since_snapshot]
+
+    diffs = []
+    for snapshot in snapshots:
+        try:
+            with open(get_snapshot_diff_file(snapshot), "r") as f:
+                diffs.append(json.load(f))
+        except (json.JSONDecodeError, FileNotFoundError):
+            continue
+    return merge_universe_diffs(diffs) if diffs else {}
+
+
+def get_tickers_affected_by_diff(diff: dict) -> list[str]:
+    """
+    Returns the tickers that need to be (re)processed after a universe refresh, i.e.
+    the added tickers. Reclassified tickers only need apply_universe_changes.
+    """
+    return sorted(diff.get(ADDED_TICKERS, []))
+
+
+def apply_universe_changes(df: pd.DataFrame, changed: dict) -> pd.DataFrame:
+    """
+    Updates the Sector, Industry and Country columns of already processed tickers
+    with the new values of the diff "changed" section.
+    """
+    if df.empty or not changed or "ticker" not in df.columns:
+        return df
+    df = df.copy()
+    for col in TICKER_CLASSIFICATION_COLUMNS:
+        new_values = {
+            ticker: columns[col][1]
+            for ticker, columns in changed.items()
+            if col in columns
+        }
+        if not new_values or col not in df.columns:
+            continue
+        mask = df["ticker"].isin(new_values.keys())
+        df.loc[mask, col] = df.loc[mask, "ticker"].map(new_values)
+    return df
 
 
 def get_df_with_all_tickers_information():
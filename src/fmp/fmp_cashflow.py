@@ -1,19 +1,105 @@
 import os
+import numpy as np
 import pandas as pd
 from typing import List
 
 from src.fmp.fmp_config import FMP_DATA_DIR
 from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+from src.fmp.fmp_panel import StatementPanel
+from src.fmp.fmp_shared_panel import attach_shared_panel
 import src.global_variables as gv
 
+CASHFLOW_FIELDS = [fmp_gv.freeCashFlow, fmp_gv.operative_cash_flow]
+FCF_LABELS = [
+    fmp_gv.fcf_4_year_ago,
+    fmp_gv.fcf_3_year_ago,
+    fmp_gv.fcf_2_year_ago,
+    fmp_gv.fcf_1_year_ago,
+]
+OCF_LABELS = [
+    fmp_gv.ocf_4_year_ago,
+    fmp_gv.ocf_3_year_ago,
+    fmp_gv.ocf_2_year_ago,
+    fmp_gv.ocf_1_year_ago,
+]
+
+
+def align_cashflow_years(
+    panel: StatementPanel, rows: np.ndarray, fields: List[str] = CASHFLOW_FIELDS
+) -> dict:
+    """
+    Cash flow years of the given panel rows, built like
+    FmpDataCashFlow._get_cashflow_data_from_panel: years with neither FCF nor OCF
+    (e.g. a year only reported in the income statement) are dropped and the other
+    years are right-aligned, the most recent one in the last column.
+
+    Args:
+        panel (StatementPanel): Statement data.
+        rows (np.ndarray): Panel rows of the tickers.
+        fields (List[str]): Fields to align, taken from the same years as the cash
+                            flows (e.g. the shares outstanding of the last FCF year).
+    Returns:
+        dict: {field: (len(rows), PANEL_YEARS) array}, NaN padded on the left.
+    """
+    has_cashflow = ~np.all(
+        [np.isnan(panel.field(field)[rows]) for field in CASHFLOW_FIELDS], axis=0
+    )
+    # stable sort: the dropped years first, the kept ones in chronological order
+    order = np.argsort(has_cashflow, axis=1, kind="stable")
+    kept = np.take_along_axis(has_cashflow, order, axis=1)
+    aligned = {}
+    for field in fields:
+        aligned[field] = np.take_along_axis(panel.field(field)[rows], order, axis=1)
+        aligned[field][~kept] = np.nan
+    return aligned
+
+
+def recent_cashflow_values(values: np.ndarray, n: int) -> np.ndarray:
+    """
+    Last n values of every row of a (n_tickers, years) array of chronological cash
+    flow years, left-padded with NaN for shorter histories.
+    """
+    if values.shape[1] < n:
+        padding = np.full((values.shape[0], n - values.shape[1]), np.nan)
+        values = np.concatenate([padding, values], axis=1)
+    return values[:, values.shape[1] - n :]
+
+
+def is_cashflow_increasing(recent_values: np.ndarray) -> np.ndarray:
+    """
+    Trend criterion of every row of a (n_tickers, n) array: values continually
+    increasing and last value positive. Missing years (NaN) fail the criterion.
+    """
+    return np.all(np.diff(recent_values, axis=1) > 0, axis=1) & (
+        recent_values[:, -1] > 0
+    )
+
 
 class FmpDataCashFlow:
-    def __init__(self, ticker: str):
+    def __init__(self, ticker: str, panel: StatementPanel | None = None):
         self.ticker = ticker
         self.json_file_cashflow = os.path.join(
             FMP_DATA_DIR, self.ticker, f"{self.ticker}_cash-flow-statement.json"
         )
-        self.df_cashflow = self._get_cashflow_data()
+        if panel is not None and ticker in panel:
+            self.df_cashflow = self._get_cashflow_data_from_panel(panel)
+        else:
+            self.df_cashflow = self._get_cashflow_data()
+
+    def _get_cashflow_data_from_panel(
+        self, panel: StatementPanel
+    ) -> pd.DataFrame | None:
+        """
+        Builds the cash flow data of the ticker from a (shared, memory-mapped) panel,
+        in ascending order (oldest to newest) like _get_cashflow_data.
+        """
+        df_cashflow = panel.to_frame(self.ticker).dropna(
+            how="all", subset=CASHFLOW_FIELDS
+        )
+        if df_cashflow.empty:
+            print(f"Warning: Cash flow data for {self.ticker} is empty.")
+            return None
+        return df_cashflow.reset_index(drop=True)
 
     def _get_cashflow_data(self) -> pd.DataFrame | None:
         """
@@ -39,79 +125,41 @@ class FmpDataCashFlow:
             print(f"Error: data for ticker {self.ticker} not found. Implement fmp API")
             return None
 
+    def _is_cashflow_increasing(
+        self, field: str, labels: List[str], n: int
+    ) -> (bool, dict):
+        """
+        Checks if the values of the field for the most recent `n` years are continually
+        increasing, and if the most recent value is positive. Tickers with fewer than
+        `n` years fail the criterion, their missing years are NaN in the returned
+        values.
+        """
+        n = min(n, len(labels))
+        if self.df_cashflow is None or self.df_cashflow.empty or n < 2:
+            return False, {}
+
+        values = self.df_cashflow[field].to_numpy(dtype=float)[None, :]
+        recent_values = recent_cashflow_values(values, n)
+        cashflow_dict = dict(zip(labels[-n:], recent_values[0].tolist()))
+        return bool(is_cashflow_increasing(recent_values)[0]), cashflow_dict
+
     def is_free_cashflow_increasing(self, n: int = 2) -> (bool, dict):
         """
-        Checks if the cash flow values for the most recent `n` years are continually increasing,
-        and if the most recent cash flow value is positive.
+        Checks if the free cash flow values for the most recent `n` years are
+        continually increasing, and if the most recent value is positive.
         """
-        fcf_labels = [
-            fmp_gv.fcf_4_year_ago,
-            fmp_gv.fcf_3_year_ago,
-            fmp_gv.fcf_2_year_ago,
-            fmp_gv.fcf_1_year_ago,
-        ]
-        if self.df_cashflow is None or self.df_cashflow.empty:
-            return False
-        n = min(n, 4)
-        if n < 2:
-            return False
-        if len(self.df_cashflow) < n:
-            return False
-
-        recent_cashflow_values = self.df_cashflow[fmp_gv.freeCashFlow].iloc[-n:]
-
-        selected_labels = fcf_labels[-n:]
-        cashflow_dict = dict(zip(selected_labels, recent_cashflow_values.tolist()))
-
-        is_continually_increasing = True
-        for i in range(n - 1):
-            if recent_cashflow_values.iloc[i] >= recent_cashflow_values.iloc[i + 1]:
-                is_continually_increasing = False
-                break
-
-        is_last_value_positive = recent_cashflow_values.iloc[-1] > 0
-        cashflow_trend_criterium = is_continually_increasing and is_last_value_positive
-
-        return cashflow_trend_criterium, cashflow_dict
+        return self._is_cashflow_increasing(fmp_gv.freeCashFlow, FCF_LABELS, n)
 
     def is_operative_cashflow_increasing(self, n: int = 2) -> (bool, dict):
         """
-        Checks if the cash flow values for the most recent `n` years are continually increasing,
-        and if the most recent cash flow value is positive.
+        Checks if the operative cash flow values for the most recent `n` years are
+        continually increasing, and if the most recent value is positive.
         """
-        ocf_labels = [
-            fmp_gv.ocf_4_year_ago,
-            fmp_gv.ocf_3_year_ago,
-            fmp_gv.ocf_2_year_ago,
-            fmp_gv.ocf_1_year_ago,
-        ]
-        if self.df_cashflow is None or self.df_cashflow.empty:
-            return False
-        n = min(n, 4)
-        if n < 2:
-            return False
-        if len(self.df_cashflow) < n:
-            return False
-
-        recent_cashflow_values = self.df_cashflow[fmp_gv.operative_cash_flow].iloc[-n:]
-
-        selected_labels = ocf_labels[-n:]
-        cashflow_dict = dict(zip(selected_labels, recent_cashflow_values.tolist()))
-
-        is_continually_increasing = True
-        for i in range(n - 1):
-            if recent_cashflow_values.iloc[i] >= recent_cashflow_values.iloc[i + 1]:
-                is_continually_increasing = False
-                break
-
-        is_last_value_positive = recent_cashflow_values.iloc[-1] > 0
-        cashflow_trend_criterium = is_continually_increasing and is_last_value_positive
-
-        return cashflow_trend_criterium, cashflow_dict
+        return self._is_cashflow_increasing(fmp_gv.operative_cash_flow, OCF_LABELS, n)
 
     @classmethod
     def collect_scores_and_features(
-        cls, tickers_list: List[str], screener_params: dict
+        cls, tickers_list: List[str], screener_params: dict, progress_callback=None
     ) -> tuple[pd.DataFrame, pd.DataFrame]:
         """
         Collects Free Cash Flow (FCF) and Operative Cash Flow (OCF) features and scores
@@ -125,12 +173,23 @@ class FmpDataCashFlow:
                   increasing and positive for each ticker.
                 - df_features: Contains FCF and OCF data for the past 'n' years for each ticker.
                 :param screener_params: dictionary with screener params
+                :param progress_callback: optional callable receiving the fraction of
+                                          processed tickers
         """
         all_ticker_features = []
         all_ticker_scores = []
-        for t in tickers_list:
+        # statement data published by publish_shared_data, shared by all processes,
+        # unless some of these tickers changed since (then they are read from disk)
+        shared_panel = attach_shared_panel(tickers_list)
+        total_tickers = len(tickers_list)
+        for i, t in enumerate(tickers_list):
+            if progress_callback:
+                progress_callback(i / total_tickers)
             try:
-                cashflow = cls(ticker=t)
+                cashflow = cls(ticker=t, panel=shared_panel)
+                if cashflow.df_cashflow is None:
+                    # no cash flow data, like the tickers left out by ScreenBatch
+                    continue
                 # Retrieve FCF data and score
                 years_fcf = screener_params.get(gv.FCF_YEARS, 3)
                 is_fcf_increasing, fcf_data = cashflow.is_free_cashflow_increasing(
@@ -3,7 +3,7 @@ import os
 
 # PATHS
 MAIN_DIR = str(Path(__file__).resolve().parents[2])
-DATA_DIR = os.path.join(MAIN_DIR, "data")
+DATA_DIR = os.environ.get("SCREENER_DATA_DIR", os.path.join(MAIN_DIR, "data"))
 FMP_DATA_DIR = os.path.join(DATA_DIR, "fmp")
 
 
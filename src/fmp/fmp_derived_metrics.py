@@ -0,0 +1,243 @@
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from typing import List
+
+from src.fmp.fmp_panel import (
+    PANEL_YEARS,
+    StatementPanel,
+    get_statement_file,
+    get_statement_signature,
+    load_statement_panel,
+    scan_statement_signatures,
+)
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+
+DERIVED_METRICS = [
+    fmp_gv.fcf_margin,
+    fmp_gv.fcf_to_net_income,
+    fmp_gv.debt_to_equity,
+    fmp_gv.gross_profit_pct_change,
+    fmp_gv.roic,
+]
+
+# {ticker: ((mtime_ns, size) of the derived metrics file, its source signature)}
+_SOURCE_SIGNATURES = {}
+_SIGNATURES_LOCK = threading.Lock()
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = numerator / denominator
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def compute_derived_metrics(panel: StatementPanel) -> dict:
+    """
+    Computes the derived ratios for every ticker and year of the panel at once.
+
+    Returns:
+        dict: {metric name: (n_tickers, PANEL_YEARS) array}, NaN where an input is
+            missing or a denominator is zero.
+    """
+    fcf = panel.field(fmp_gv.freeCashFlow)
+    revenue = panel.field(fmp_gv.revenue)
+    net_income = panel.field(fmp_gv.net_income_fmp)
+    gross_profit = panel.field(fmp_gv.gross_profit)
+    debt = panel.field(fmp_gv.totalDebt)
+    equity = panel.field(fmp_gv.totalStockholdersEquity)
+    cash = panel.field(fmp_gv.cash_and_cash_equivalents)
+
+    gross_profit_pct_change = np.full_like(gross_profit, np.nan)
+    gross_profit_pct_change[:, 1:] = _safe_divide(
+        gross_profit[:, 1:] - gross_profit[:, :-1], np.abs(gross_profit[:, :-1])
+    )
+
+    # NOPAT / invested capital, with the effective tax rate bounded to [0, 1]
+    tax_rate = np.clip(
+        _safe_divide(
+            panel.field(fmp_gv.income_tax_expense),
+            panel.field(fmp_gv.income_before_tax),
+        ),
+        0.0,
+        1.0,
+    )
+    nopat = panel.field(fmp_gv.operating_income) * (1.0 - np.nan_to_num(tax_rate))
+    invested_capital = debt + equity - np.nan_to_num(cash)
+    invested_capital[invested_capital <= 0] = np.nan
+
+    return {
+        fmp_gv.fcf_margin: _safe_divide(fcf, revenue),
+        fmp_gv.fcf_to_net_income: _safe_divide(fcf, net_income),
+        fmp_gv.debt_to_equity: _safe_divide(debt, equity),
+        fmp_gv.gross_profit_pct_change: gross_profit_pct_change,
+        fmp_gv.roic: _safe_divide(nopat, invested_capital),
+    }
+
+
+def get_derived_metrics_file(ticker: str) -> str:
+    return get_statement_file(ticker, fmp_gv.derived_metrics)
+
+
+def _read_source_signature(ticker: str):
+    """
+    Returns the statement signature a derived metrics file was computed from, or
+    None if the file is missing or unreadable. Files are only parsed again when
+    their own mtime or size changed, otherwise this costs one os.stat call.
+    """
+    file_path = get_derived_metrics_file(ticker)
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    file_stat = (stat.st_mtime_ns, stat.st_size)
+    with _SIGNATURES_LOCK:
+        cached = _SOURCE_SIGNATURES.get(ticker)
+    if cached is not None and cached[0] == file_stat:
+        return cached[1]
+    try:
+        with open(file_path, "r") as f:
+            signature = json.load(f).get("source_signature")
+    except (json.JSONDecodeError, FileNotFoundError, AttributeError):
+        return None
+    with _SIGNATURES_LOCK:
+        _SOURCE_SIGNATURES[ticker] = (file_stat, signature)
+    return signature
+
+
+def _write_ticker_metrics(
+    panel: StatementPanel, metrics: dict, t_idx: int, signature: tuple
+):
+    ticker = panel.tickers[t_idx]
+    last_year = int(panel.last_years[t_idx])
+    records = []
+    for y_idx in range(PANEL_YEARS - 1, -1, -1):
+        raw = {
+            f: panel.values[f_idx, t_idx, y_idx] for f_idx, f in enumerate(panel.fields)
+        }
+        if all(np.isnan(v) for v in raw.values()):
+            continue
+        record = {
+            "symbol": ticker,
+            fmp_gv.calendar_year: str(last_year - (PANEL_YEARS - 1 - y_idx)),
+        }
+        record.update(raw)
+        record.update({m: metrics[m][t_idx, y_idx] for m in DERIVED_METRICS})
+        records.append(
+            {
+                k: None if isinstance(v, float) and np.isnan(v) else v
+                for k, v in record.items()
+            }
+        )
+
+    # yearly records are stored newest first, like the FMP statements. Concurrent
+    # writers (shard workers, API threads, app sessions) each use their own
+    # temporary file, so the replace is atomic and never fails
+    file_path = get_derived_metrics_file(ticker)
+    fd, tmp_file = tempfile.mkstemp(
+        dir=os.path.dirname(file_path), prefix=f".{ticker}_", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {"source_signature": signature, "records": records},
+                f,
+                indent=4,
+                default=float,
+            )
+        os.replace(tmp_file, file_path)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def refresh_derived_metrics(
+    tickers: List[str] | None = None, signatures: dict | None = None
+) -> List[str]:
+    """
+    Recomputes the derived metrics of the tickers whose statement files changed since
+    their derived metrics were computed and stores them in
+    data/fmp/<TICKER>/<TICKER>_derived-metrics.json.
+
+    Each file holds the signature of the statement files it was computed from, so no
+    shared index has to be written and concurrent callers do not conflict.
+
+    Args:
+        tickers (List[str] | None): Tickers to check, all available tickers by default.
+        signatures (dict | None): Precomputed {ticker: signature} (see
+                                  scan_statement_signatures), of these tickers.
+    Returns:
+        List[str]: The tickers that were recomputed.
+    """
+    if signatures is None:
+        signatures = scan_statement_signatures(tickers)
+    elif tickers is not None:
+        signatures = {t: signatures[t] for t in tickers if t in signatures}
+    changed = [
+        t
+        for t, sig in signatures.items()
+        # tickers without statement files have nothing to compute
+        if any(s is not None for s in sig)
+        and _read_source_signature(t) != json.loads(json.dumps(sig))
+    ]
+    if not changed:
+        return []
+
+    panel = load_statement_panel(changed)
+    metrics = compute_derived_metrics(panel)
+    for t_idx, ticker in enumerate(panel.tickers):
+        if panel.last_years[t_idx] == 0:
+            continue
+        _write_ticker_metrics(panel, metrics, t_idx, signatures[ticker])
+
+    print(f"Derived metrics refreshed for {len(changed)} tickers.")
+    return changed
+
+
+def load_derived_metrics(tickers: List[str], latest_only: bool = True) -> pd.DataFrame:
+    """
+    Reads the precomputed derived metrics of the given tickers. Files computed from
+    statement files that changed since are skipped (call refresh_derived_metrics first).
+
+    Args:
+        tickers (List[str]): Tickers to read.
+        latest_only (bool): Return only the most recent year of each ticker.
+    Returns:
+        pd.DataFrame: One row per ticker (or per ticker-year) with a 'ticker' column,
+            the raw statement values and the DERIVED_METRICS columns.
+    """
+    rows = []
+    for ticker in tickers:
+        file_path = get_derived_metrics_file(ticker)
+        if not os.path.exists(file_path):
+            continue
+        try:
+            with open(file_path, "r") as f:
+                data = json.load(f)
+            records = data["records"]
+        except (json.JSONDecodeError, KeyError) as e:
+            print(f"Error reading derived metrics for {ticker}: {e}")
+            continue
+        if data.get("source_signature") != json.loads(
+            json.dumps(get_statement_signature(ticker))
+        ):
+            print(f"Warning: derived metrics of {ticker} are outdated, skipped.")
+            continue
+        if latest_only:
+            records = records[:1]
+        for record in records:
+            rows.append({"ticker": ticker, **record})
+
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return pd.DataFrame(columns=["ticker"] + DERIVED_METRICS)
+    return df.drop(columns=["symbol"], errors="ignore")
+
+
+if __name__ == "__main__":
+    refresh_derived_metrics()
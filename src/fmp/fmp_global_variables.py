@@ -1,9 +1,19 @@
 class GlobalVars:
+    ### Statements
+    cash_flow_statement = "cash-flow-statement"
+    income_statement = "income-statement"
+    balance_sheet_statement = "balance-sheet-statement"
+    derived_metrics = "derived-metrics"
+    calendar_year = "calendarYear"
+
     ### FreeCashFLow
     freeCashFlow = "freeCashFlow"
     increasing_fcf_condition = "FCF Positive Trend"
     increasing_ocf_condition = "OCF Positive Trend"
     operative_cash_flow = "netCashProvidedByOperatingActivities"
+    fcf_regression_trend_condition = "FCF Regression Trend"
+    ocf_regression_trend_condition = "OCF Regression Trend"
+    revenue_regression_trend_condition = "Revenue Regression Trend"
 
     fcf_1_year_ago = "FCF 1 Year Ago"
     fcf_2_year_ago = "FCF 2 Years Ago"
@@ -19,8 +29,20 @@ class GlobalVars:
     gross_profit_condition = "gross_profit_condition"
     gross_profit_pct_change = "gross_profit_pct_change"
 
+    ### Derived metrics
+    fcf_margin = "fcf_margin"
+    fcf_to_net_income = "fcf_to_net_income"
+    debt_to_equity = "debt_to_equity"
+    roic = "roic"
+
     net_income_fmp = "netIncome"
 
     revenue = "revenue"
+    operating_income = "operatingIncome"
+    income_before_tax = "incomeBeforeTax"
+    income_tax_expense = "incomeTaxExpense"
+    shares_outstanding = "weightedAverageShsOut"
+    capital_expenditure = "capitalExpenditure"
+    cash_and_cash_equivalents = "cashAndCashEquivalents"
     totalDebt = "totalDebt"
     totalStockholdersEquity = "totalStockholdersEquity"
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import List
+
+from src.fmp.fmp_config import FMP_DATA_DIR
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+import src.global_variables as gv
+
+# number of yearly reports kept per ticker, most recent year in the last column
+PANEL_YEARS = 5
+
+STATEMENT_FIELDS = {
+    fmp_gv.cash_flow_statement: [
+        fmp_gv.freeCashFlow,
+        fmp_gv.operative_cash_flow,
+        fmp_gv.capital_expenditure,
+    ],
+    fmp_gv.income_statement: [
+        fmp_gv.revenue,
+        fmp_gv.gross_profit,
+        fmp_gv.net_income_fmp,
+        fmp_gv.operating_income,
+        fmp_gv.income_before_tax,
+        fmp_gv.income_tax_expense,
+        fmp_gv.shares_outstanding,
+    ],
+    fmp_gv.balance_sheet_statement: [
+        fmp_gv.totalDebt,
+        fmp_gv.totalStockholdersEquity,
+        fmp_gv.cash_and_cash_equivalents,
+    ],
+}
+
+_PANEL_CACHE = {}
+
+
+def get_statement_file(ticker: str, statement: str) -> str:
+    return os.path.join(FMP_DATA_DIR, ticker, f"{ticker}_{statement}.json")
+
+
+def list_available_tickers() -> List[str]:
+    """
+    Returns the sorted list of tickers that have a folder in FMP_DATA_DIR.
+    """
+    return sorted(entry.name for entry in os.scandir(FMP_DATA_DIR) if entry.is_dir())
+
+
+def get_statement_signature(ticker: str) -> tuple:
+    """
+    Returns a cheap fingerprint of the statement files of a ticker, built from
+    (mtime_ns, size) of each file. Missing files are represented by None.
+    """
+    signature = []
+    for statement in STATEMENT_FIELDS:
+        try:
+            stat = os.stat(get_statement_file(ticker, statement))
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def scan_statement_signatures(tickers: List[str] | None = None) -> dict:
+    """
+    Builds the {ticker: signature} index for the given tickers (all available
+    tickers by default) using only os.stat calls.
+    """
+    if tickers is None:
+        tickers = list_available_tickers()
+    return {t: get_statement_signature(t) for t in tickers}
+
+
+def get_universe_stat() -> list | None:
+    """
+    Returns [mtime_ns, size] of the finviz universe file, or None if it is missing.
+    """
+    if not os.path.exists(gv.ALL_STOCKS_INFO_FILE):
+        return None
+    stat = os.stat(gv.ALL_STOCKS_INFO_FILE)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def get_data_version(signatures: dict | None = None) -> str:
+    """
+    Returns a short hash identifying the current state of the statement data and
+    of the finviz universe file. It changes whenever any of these files changes.
+    """
+    if signatures is None:
+        signatures = scan_statement_signatures()
+    hasher = hashlib.sha1()
+    for ticker in sorted(signatures):
+        hasher.update(f"{ticker}:{signatures[ticker]};".encode())
+    universe_stat = get_universe_stat()
+    if universe_stat is not None:
+        hasher.update(f"universe:{universe_stat[0]}:{universe_stat[1]}".encode())
+    return hasher.hexdigest()[:16]
+
+
+class StatementPanel:
+    """
+    Dense tickers x years array of statement fields.
+
+    values has shape (n_fields, n_tickers, PANEL_YEARS): values[f, t, -1] is the most
+    recent yearly report of ticker t, older years are on the left and padded with NaN
+    for short histories.
+    """
+
+    def __init__(
+        self,
+        tickers: List[str],
+        fields: List[str],
+        values: np.ndarray,
+        last_years: np.ndarray,
+    ):
+        self.tickers = list(tickers)
+        self.fields = list(fields)
+        self.values = values
+        self.last_years = last_years
+        self._ticker_index = {t: i for i, t in enumerate(self.tickers)}
+        self._field_index = {f: i for i, f in enumerate(self.fields)}
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._ticker_index
+
+    def field(self, name: str) -> np.ndarray:
+        """
+        Returns the (n_tickers, PANEL_YEARS) array of a field.
+        """
+        return self.values[self._field_index[name]]
+
+    def ticker_position(self, ticker: str) -> int:
+        return self._ticker_index[ticker]
+
+    def ticker_positions(self, tickers: List[str]) -> np.ndarray:
+        """
+        Returns the row of each ticker in the panel, -1 for tickers not in the panel.
+        """
+        return np.array([self._ticker_index.get(t, -1) for t in tickers], dtype=int)
+
+    def to_frame(self, ticker: str) -> pd.DataFrame:
+        """
+        Returns the yearly data of one ticker in chronological order (oldest to newest),
+        dropping the padding years.
+        """
+        i = self._ticker_index[ticker]
+        df = pd.DataFrame(self.values[:, i, :].T, columns=self.fields)
+        last_year = self.last_years[i]
+        df[fmp_gv.calendar_year] = np.arange(last_year - PANEL_YEARS + 1, last_year + 1)
+        return df.dropna(how="all", subset=self.fields).reset_index(drop=True)
+
+    def update(
+        self, other: "StatementPanel", removed: List[str] = ()
+    ) -> "StatementPanel":
+        """
+        Returns a new panel where the rows of `other` replace (or are appended to)
+        the rows of this panel and the `removed` tickers are dropped.
+        """
+        drop = set(removed) | set(other.tickers)
+        keep = [i for i, t in enumerate(self.tickers) if t not in drop]
+        tickers = [self.tickers[i] for i in keep] + other.tickers
+        values = np.concatenate([self.values[:, keep, :], other.values], axis=1)
+        last_years = np.concatenate([self.last_years[keep], other.last_years])
+        return StatementPanel(tickers, self.fields, values, last_years)
+
+
+def _read_statement_records(ticker: str, statement: str) -> list:
+    file_path = get_statement_file(ticker, statement)
+    if not os.path.exists(file_path):
+        return []
+    try:
+        with open(file_path, "r") as f:
+            records = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Error reading {file_path}: {e}")
+        return []
+    return [r for r in records if r.get(fmp_gv.calendar_year)]
+
+
+def load_statement_panel(tickers: List[str] | None = None) -> StatementPanel:
+    """
+    Reads the cash flow, income and balance sheet statements of the given tickers
+    (all available tickers by default) into a StatementPanel.
+
+    Statements are aligned on calendar year, using the latest year reported by any
+    of the three statements of each ticker as the last panel column.
+    """
+    if tickers is None:
+        tickers = list_available_tickers()
+    fields = [
+        f for statement_fields in STATEMENT_FIELDS.values() for f in statement_fields
+    ]
+    values = np.full((len(fields), len(tickers), PANEL_YEARS), np.nan)
+    last_years = np.zeros(len(tickers), dtype=int)
+
+    for t_idx, ticker in enumerate(tickers):
+        records_by_statement = {
+            statement: _read_statement_records(ticker, statement)
+            for statement in STATEMENT_FIELDS
+        }
+        years = [
+            int(r[fmp_gv.calendar_year])
+            for records in records_by_statement.values()
+            for r in records
+        ]
+        if not years:
+            continue
+        last_year = max(years)
+        last_years[t_idx] = last_year
+
+        f_offset = 0
+        for statement, statement_fields in STATEMENT_FIELDS.items():
+            for record in records_by_statement[statement]:
+                y_idx = (
+                    PANEL_YEARS - 1 - (last_year - int(record[fmp_gv.calendar_year]))
+                )
+                if y_idx < 0:
+                    continue
+                for f_idx, field in enumerate(statement_fields):
+                    value = record.get(field)
+                    if isinstance(value, (int, float)):
+                        values[f_offset + f_idx, t_idx, y_idx] = value
+            f_offset += len(statement_fields)
+
+    return StatementPanel(tickers, fields, values, last_years)
+
+
+def get_statement_panel(data_version: str | None = None) -> StatementPanel:
+    """
+    Returns the panel of all available tickers, loading it only once per data version.
+    """
+    if data_version is None:
+        data_version = get_data_version()
+    panel = _PANEL_CACHE.get(data_version)
+    if panel is None:
+        panel = load_statement_panel()
+        # another caller may clear the cache meanwhile: return the local panel
+        _PANEL_CACHE.clear()
+        _PANEL_CACHE[data_version] = panel
+    return panel
+
+
+def growth_over_years(values: np.ndarray, n: int) -> np.ndarray:
+    """
+    Relative change between the value n-1 years before the last one and the last
+    value, for every row of a (n_tickers, PANEL_YEARS) array.
+    Rows with a missing or zero base value get NaN.
+    """
+    n = max(2, min(n, values.shape[1]))
+    base = values[:, -n]
+    last = values[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (last - base) / np.abs(base)
+    growth[~np.isfinite(growth)] = np.nan
+    return growth
@@ -0,0 +1,266 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from typing import List
+
+from src.fmp.fmp_panel import (
+    StatementPanel,
+    get_data_version,
+    get_statement_signature,
+    get_universe_stat,
+    load_statement_panel,
+    scan_statement_signatures,
+)
+import src.global_variables as gv
+
+# number of published versions kept on disk, older ones are deleted on publish.
+# Readers still mapping a deleted version keep working until they re-attach.
+KEEP_SHARED_VERSIONS = 2
+
+_ATTACHED = {}
+
+
+class SharedUniverse:
+    """
+    Read-only view of the finviz universe stored as memory-mapped fixed width arrays,
+    sorted by ticker. Only the rows requested by lookup are copied into a DataFrame.
+    """
+
+    def __init__(self, columns: dict):
+        self.columns = columns
+        self.tickers = columns["Ticker"]
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def lookup(self, tickers: List[str]) -> pd.DataFrame:
+        """
+        Returns the universe rows of the given tickers (unknown tickers are skipped).
+        """
+        tickers = np.asarray(list(tickers), dtype=str)
+        positions = np.searchsorted(self.tickers, tickers)
+        positions = np.clip(positions, 0, max(len(self.tickers) - 1, 0))
+        found = (
+            self.tickers[positions] == tickers
+            if len(self.tickers)
+            else np.zeros(len(tickers), dtype=bool)
+        )
+        positions = positions[found]
+        return pd.DataFrame(
+            {
+                col: values[positions].astype(object)
+                for col, values in self.columns.items()
+            }
+        ).replace("", np.nan)
+
+    def to_frame(self) -> pd.DataFrame:
+        return self.lookup(self.tickers)
+
+
+def _current_version() -> str | None:
+    try:
+        with open(gv.SHARED_CURRENT_FILE, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish_shared_data(
+    panel: StatementPanel | None = None,
+    df_universe: pd.DataFrame | None = None,
+    data_version: str | None = None,
+    signatures: dict | None = None,
+) -> str:
+    """
+    Writes the statement panel and the finviz universe as .npy files under
+    SHARED_DATA_DIR/<version>/ and atomically points SHARED_CURRENT_FILE to them.
+
+    Readers that attached a previous version keep their mapping, new attach calls
+    get the new version.
+
+    Args:
+        panel (StatementPanel | None): Panel to publish. Loaded from the statement
+                                       files if not given.
+        df_universe (pd.DataFrame | None): Universe to publish. Read from
+                                           ALL_STOCKS_INFO_FILE if not given.
+        data_version (str | None): Version id, computed from the data files if not given.
+        signatures (dict | None): Statement signatures the panel was loaded from (see
+                                  scan_statement_signatures), stored so that readers
+                                  can detect files changed after publishing. Scanned
+                                  if not given.
+    Returns:
+        str: The published version.
+    """
+    if signatures is None:
+        signatures = scan_statement_signatures()
+    if data_version is None:
+        data_version = get_data_version(signatures)
+    version_dir = os.path.join(gv.SHARED_DATA_DIR, data_version)
+    if data_version == _current_version() and os.path.isdir(version_dir):
+        return data_version
+
+    universe_stat = get_universe_stat()
+    if panel is None:
+        panel = load_statement_panel(list(signatures))
+    if df_universe is None:
+        if os.path.exists(gv.ALL_STOCKS_INFO_FILE):
+            df_universe = pd.read_csv(gv.ALL_STOCKS_INFO_FILE)
+        else:
+            df_universe = pd.DataFrame(columns=gv.TICKER_INFO_COLUMNS)
+
+    tmp_dir = f"{version_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "values.npy"), np.ascontiguousarray(panel.values))
+    np.save(os.path.join(tmp_dir, "last_years.npy"), panel.last_years)
+    np.save(os.path.join(tmp_dir, "tickers.npy"), np.array(panel.tickers, dtype=str))
+    df_universe = df_universe.drop_duplicates("Ticker").sort_values("Ticker")
+    for col in gv.TICKER_INFO_COLUMNS:
+        values = df_universe[col].fillna("").astype(str).to_numpy(dtype=str)
+        np.save(os.path.join(tmp_dir, f"universe_{col}.npy"), values)
+    with open(os.path.join(tmp_dir, "metadata.json"), "w") as f:
+        json.dump(
+            {
+                "version": data_version,
+                "fields": panel.fields,
+                "universe_stat": universe_stat,
+            },
+            f,
+            indent=4,
+        )
+    with open(os.path.join(tmp_dir, "signatures.json"), "w") as f:
+        json.dump(signatures, f)
+
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(tmp_dir, version_dir)
+
+    tmp_pointer = f"{gv.SHARED_CURRENT_FILE}.tmp"
+    with open(tmp_pointer, "w") as f:
+        f.write(data_version)
+    os.replace(tmp_pointer, gv.SHARED_CURRENT_FILE)
+
+    _remove_old_versions()
+    print(f"Shared data version {data_version} published to {version_dir}")
+    return data_version
+
+
+def _remove_old_versions():
+    versions = [
+        entry
+        for entry in os.scandir(gv.SHARED_DATA_DIR)
+        if entry.is_dir() and not entry.name.endswith(".tmp")
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in versions[KEEP_SHARED_VERSIONS:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _attach(version: str) -> dict:
+    version_dir = os.path.join(gv.SHARED_DATA_DIR, version)
+    with open(os.path.join(version_dir, "metadata.json"), "r") as f:
+        metadata = json.load(f)
+
+    def load(name):
+        return np.load(os.path.join(version_dir, name), mmap_mode="r")
+
+    panel = StatementPanel(
+        load("tickers.npy").tolist(),
+        metadata["fields"],
+        load("values.npy"),
+        load("last_years.npy"),
+    )
+    universe = SharedUniverse(
+        {col: load(f"universe_{col}.npy") for col in gv.TICKER_INFO_COLUMNS}
+    )
+    with open(os.path.join(version_dir, "signatures.json"), "r") as f:
+        signatures = {
+            t: tuple(tuple(s) if s is not None else None for s in sig)
+            for t, sig in json.load(f).items()
+        }
+    return {
+        "version": version,
+        "panel": panel,
+        "universe": universe,
+        "signatures": signatures,
+        "universe_stat": metadata.get("universe_stat"),
+    }
+
+
+def _get_attached() -> dict | None:
+    version = _current_version()
+    if version is None:
+        return None
+    if _ATTACHED.get("version") != version:
+        try:
+            attached = _attach(version)
+        except (FileNotFoundError, json.JSONDecodeError, ValueError) as e:
+            print(f"Error attaching shared data version {version}: {e}")
+            return None
+        _ATTACHED.clear()
+        _ATTACHED.update(attached)
+    return _ATTACHED
+
+
+def get_stale_shared_tickers(tickers: List[str] | None = None) -> List[str]:
+    """
+    Returns the tickers whose statement files changed (or appeared) after the shared
+    data was published, checking only the given tickers (all available tickers and
+    all published ones by default). Costs one os.stat per statement file.
+    """
+    attached = _get_attached()
+    if attached is None:
+        return []
+    published = attached["signatures"]
+    if tickers is None:
+        current = scan_statement_signatures()
+        tickers = set(current) | set(published)
+    else:
+        current = {t: get_statement_signature(t) for t in tickers}
+    stale = []
+    for ticker in tickers:
+        signature = current.get(ticker) or get_statement_signature(ticker)
+        # tickers without any statement file are not published
+        no_files = tuple(None for _ in signature)
+        if published.get(ticker, no_files) != signature:
+            stale.append(ticker)
+    return sorted(stale)
+
+
+def attach_shared_panel(
+    tickers: List[str] | None = None, check_fresh: bool = True
+) -> StatementPanel | None:
+    """
+    Returns the published statement panel, memory-mapped read-only, or None if no
+    version was published. The mapping is refreshed when a new version is published.
+
+    Args:
+        tickers (List[str] | None): Tickers the caller reads. With check_fresh, None
+                                    is returned if any of their statement files
+                                    changed after publishing (all tickers by default),
+                                    so that the caller reads the files from disk.
+        check_fresh (bool): Whether to check the statement files.
+    """
+    attached = _get_attached()
+    if attached is None:
+        return None
+    if check_fresh and get_stale_shared_tickers(tickers):
+        return None
+    return attached["panel"]
+
+
+def attach_shared_universe() -> SharedUniverse | None:
+    """
+    Returns the published finviz universe, memory-mapped read-only, or None if no
+    version was published or the universe file changed after publishing.
+    """
+    attached = _get_attached()
+    if attached is None or attached["universe_stat"] != get_universe_stat():
+        return None
+    return attached["universe"]
+
+
+if __name__ == "__main__":
+    publish_shared_data()
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+from typing import List
+
+from src.fmp.fmp_cashflow import align_cashflow_years
+from src.fmp.fmp_panel import StatementPanel, load_statement_panel
+from src.fmp.fmp_shared_panel import attach_shared_panel
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+
+# field -> (label prefix, regression trend condition)
+TREND_FIELDS = {
+    fmp_gv.freeCashFlow: ("FCF", fmp_gv.fcf_regression_trend_condition),
+    fmp_gv.operative_cash_flow: ("OCF", fmp_gv.ocf_regression_trend_condition),
+    fmp_gv.revenue: ("Revenue", fmp_gv.revenue_regression_trend_condition),
+}
+# a trend condition holds when the fitted line grows by at least MIN_TREND_SLOPE of
+# the mean level per year, fits with R² >= MIN_TREND_R2 and the last value is positive
+MIN_TREND_SLOPE = 0.05
+MIN_TREND_R2 = 0.5
+# fewer valid years than this (or than n) give NaN
+MIN_TREND_POINTS = 3
+
+
+def slope_column(prefix: str) -> str:
+    return f"{prefix} Trend Slope"
+
+
+def r2_column(prefix: str) -> str:
+    return f"{prefix} Trend R2"
+
+
+def cagr_column(prefix: str) -> str:
+    return f"{prefix} CAGR"
+
+
+def fit_trends(values: np.ndarray, n: int) -> dict:
+    """
+    Least-squares line over the last n years of every row of a (n_tickers, years)
+    array, in closed form from masked sums so that all tickers are fitted at once.
+    Missing years are left out of the fit of their ticker.
+
+    Returns:
+        dict: (n_tickers,) arrays:
+            - "slope": yearly slope divided by the mean absolute value of the years
+              used, i.e. the relative yearly growth of the fitted line.
+            - "r2": coefficient of determination of the fit (NaN for flat values).
+            - "cagr": compound annual growth between the first and last valid years,
+              NaN unless both are positive.
+            - "last": last valid value.
+        All are NaN for tickers with fewer than min(n, MIN_TREND_POINTS) valid years.
+    """
+    n = max(2, min(n, values.shape[1]))
+    y = values[:, -n:]
+    mask = ~np.isnan(y)
+    x = np.broadcast_to(np.arange(n, dtype=float), y.shape)
+    xm = np.where(mask, x, 0.0)
+    ym = np.where(mask, y, 0.0)
+
+    count = mask.sum(axis=1).astype(float)
+    sx = xm.sum(axis=1)
+    sy = ym.sum(axis=1)
+    sxx = (xm * xm).sum(axis=1)
+    sxy = (xm * ym).sum(axis=1)
+    syy = (ym * ym).sum(axis=1)
+
+    cov = count * sxy - sx * sy
+    var_x = count * sxx - sx * sx
+    var_y = count * syy - sy * sy
+    enough = count >= min(n, MIN_TREND_POINTS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = cov / var_x
+        mean_level = np.abs(ym).sum(axis=1) / count
+        slope = slope / mean_level
+        r2 = cov * cov / (var_x * var_y)
+
+    # first and last valid year of each row
+    rows = np.arange(len(y))
+    first_pos = mask.argmax(axis=1)
+    last_pos = n - 1 - mask[:, ::-1].argmax(axis=1)
+    first = y[rows, first_pos]
+    last = y[rows, last_pos]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = (last / first) ** (1.0 / (last_pos - first_pos)) - 1.0
+    cagr[(first <= 0) | (last <= 0)] = np.nan
+
+    trends = {"slope": slope, "r2": r2, "cagr": cagr, "last": last}
+    for result in trends.values():
+        result[~enough | ~np.isfinite(result)] = np.nan
+    return trends
+
+
+def compute_trend_features(
+    panel: StatementPanel,
+    n: int = 4,
+    tickers: List[str] | None = None,
+    min_slope: float = MIN_TREND_SLOPE,
+    min_r2: float = MIN_TREND_R2,
+) -> pd.DataFrame:
+    """
+    Computes the regression trend of FCF, OCF and revenue for the given tickers (all
+    panel tickers by default).
+
+    Returns:
+        pd.DataFrame: One row per ticker with a 'ticker' column, the boolean trend
+            conditions (counted by calculate_score) and the continuous slope, R² and
+            CAGR columns. Tickers missing from the panel fail the conditions.
+    """
+    if tickers is None:
+        tickers = list(panel.tickers)
+    positions = panel.ticker_positions(tickers)
+    in_panel = positions >= 0
+
+    rows = positions[in_panel]
+    # FCF and OCF over the cash flow years of each ticker, like the "Positive Trend"
+    # criteria, revenue over the calendar years
+    cashflow = align_cashflow_years(panel, rows)
+
+    df_trends = pd.DataFrame({"ticker": tickers})
+    for field, (prefix, condition) in TREND_FIELDS.items():
+        values = np.full((len(tickers), panel.values.shape[2]), np.nan)
+        values[in_panel] = (
+            cashflow[field] if field in cashflow else panel.field(field)[rows]
+        )
+        trends = fit_trends(values, n)
+        # NaN compares as False: short histories fail the condition
+        df_trends[condition] = (
+            (trends["slope"] >= min_slope)
+            & (trends["r2"] >= min_r2)
+            & (trends["last"] > 0)
+        )
+        df_trends[slope_column(prefix)] = trends["slope"]
+        df_trends[r2_column(prefix)] = trends["r2"]
+        df_trends[cagr_column(prefix)] = trends["cagr"]
+    return df_trends
+
+
+def get_trend_features(tickers: List[str], n: int = 4) -> pd.DataFrame:
+    """
+    compute_trend_features on the published shared panel when it is current for
+    these tickers, otherwise on the statements of these tickers only, read from disk.
+    """
+    panel = attach_shared_panel(tickers)
+    if panel is None:
+        panel = load_statement_panel(tickers)
+    return compute_trend_features(panel, n, tickers)
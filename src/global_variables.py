@@ -3,19 +3,50 @@ from pathlib import Path
 
 # PATHS
 MAIN_DIR = str(Path(__file__).resolve().parents[1])
-DATA_DIR = os.path.join(MAIN_DIR, "data")
+# SCREENER_DATA_DIR points every process (e.g. shard workers) to another data folder
+DATA_DIR = os.environ.get("SCREENER_DATA_DIR", os.path.join(MAIN_DIR, "data"))
+FINVIZ_DIR = os.path.join(DATA_DIR, "finviz")
+UNIVERSE_SNAPSHOTS_DIR = os.path.join(FINVIZ_DIR, "snapshots")
+SHARED_DATA_DIR = os.path.join(DATA_DIR, "shared")
+RESULTS_DIR = os.path.join(DATA_DIR, "results")
+SCREENS_DIR = os.path.join(DATA_DIR, "screens")
+SCREEN_RESULTS_DIR = os.path.join(DATA_DIR, "screen_results")
 
 # FILES
-ALL_STOCKS_INFO_FILE = os.path.join(DATA_DIR, "finviz", "all_stocks_tickers.csv")
+ALL_STOCKS_INFO_FILE = os.path.join(FINVIZ_DIR, "all_stocks_tickers.csv")
+UNIVERSE_DIFF_FILE = os.path.join(FINVIZ_DIR, "universe_diff.json")
+SHARED_CURRENT_FILE = os.path.join(SHARED_DATA_DIR, "CURRENT")
+RESULTS_LATEST_FILE = os.path.join(RESULTS_DIR, "LATEST")
+WATCH_INDEX_FILE = os.path.join(RESULTS_DIR, "watch_index.json")
+YAHOO_QUOTES_CACHE_FILE = os.path.join(DATA_DIR, "yfinance", "quotes_cache.json")
+SIMILARITY_INDEX_FILE = os.path.join(DATA_DIR, "similarity", "profile_index.npz")
 
 # PARAMETERS NAMES
 FCF_YEARS = "fcf_years"
 OCF_YEARS = "ocf_years"
+TREND_YEARS = "trend_years"
+SCORE_WEIGHTS = "score_weights"
+
+# UNIVERSE
+TICKER_INFO_COLUMNS = ["Ticker", "Company", "Sector", "Industry", "Country"]
+TICKER_CLASSIFICATION_COLUMNS = ["Sector", "Industry", "Country"]
+ADDED_TICKERS = "added"
+REMOVED_TICKERS = "removed"
+CHANGED_TICKERS = "changed"
 
 # GENERAL
 SCORE = "score"
+RANK = "rank"
 P_E_RATIO = "P_E_ratio"
 INSIDER_OWNERSHIP = "insider_ownership"
 FREE_CASHFLOW = "Free Cash Flow"
 MARKET_CAP = "Market Cap"
 ENTERPRISE_TO_EBITDA = "EV/EBITDA"
+FCF_GROWTH = "FCF Growth"
+OCF_GROWTH = "OCF Growth"
+SIMILARITY = "similarity"
+DCF_GROWTH = "DCF Growth"
+INTRINSIC_VALUE = "Intrinsic Value"
+INTRINSIC_VALUE_PER_SHARE = "Intrinsic Value/Share"
+MARGIN_OF_SAFETY = "Margin of Safety"
+UNDERVALUED_SCENARIOS = "Undervalued Scenarios"
@@ -1,13 +1,22 @@
 import pandas as pd
-import numerize.numerize as nm
 
 from src.fmp.fmp_cashflow import FmpDataCashFlow
-from src.utils import reorder_dataframes_columns, add_ticker_info, calculate_score
+from src.fmp.fmp_trend import get_trend_features
+from src.finviz.finviz_screener import (
+    apply_universe_changes,
+    get_tickers_affected_by_diff,
+)
+from src.utils import (
+    reorder_dataframes_columns,
+    add_ticker_info,
+    add_derived_metrics,
+    calculate_score,
+)
 import src.global_variables as gv
 
 
 def process_tickers(
-    tickers: list[str], screener_parameters: dict
+    tickers: list[str], screener_parameters: dict, progress_callback=None
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Processes financial data for a list of stock tickers, calculates scores,
@@ -17,23 +26,42 @@ def process_tickers(
         tickers (list[str]): A list of stock ticker symbols to process.
         screener_parameters (dict): A dictionary containing parameters for the screener,
                                     e.g., fcf_years, ocf_years.
+        progress_callback (callable, optional): Called with the fraction of processed
+                                                tickers.
     Returns:
         tuple[pd.DataFrame, pd.DataFrame]: A tuple containing two pandas DataFrames:
             - df_scores (pd.DataFrame): DataFrame with calculated scores and ticker information,
               sorted by score in descending order.
             - df_features (pd.DataFrame): DataFrame with collected features, calculated scores,
               and ticker information, sorted by score in descending order.
+        Values are kept numeric, numerize_columns shortens them for display.
     """
     if not tickers:
         return pd.DataFrame(), pd.DataFrame()
 
     # process Cash Flow Data
     df_scores, df_features = FmpDataCashFlow.collect_scores_and_features(
-        tickers_list=tickers, screener_params=screener_parameters
+        tickers_list=tickers,
+        screener_params=screener_parameters,
+        progress_callback=progress_callback,
     )
+    if df_scores.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    # optional regression trend criteria (see src/fmp/fmp_trend.py)
+    if screener_parameters.get(gv.TREND_YEARS):
+        df_scores, df_features = add_trend_features(
+            df_scores,
+            df_features,
+            screener_parameters[gv.TREND_YEARS],
+            screener_parameters.get(gv.SCORE_WEIGHTS),
+        )
     # add scores to both dfs
-    df_scores = calculate_score(df_scores)
+    df_scores = calculate_score(
+        df_scores, weights=screener_parameters.get(gv.SCORE_WEIGHTS)
+    )
     df_features[gv.SCORE] = df_scores[gv.SCORE]
+    # add precomputed ratios (see src/fmp/fmp_derived_metrics.py)
+    df_features = add_derived_metrics(df_features)
     # add more info
     df_scores, df_features, df_info_stocks = add_ticker_info(df_scores, df_features)
     # reorder
@@ -44,17 +72,93 @@ def process_tickers(
     df_scores = df_scores.sort_values(by=gv.SCORE, ascending=False)
     df_features = df_features.sort_values(by=gv.SCORE, ascending=False)
 
-    numerical_cols = df_features.select_dtypes(include=["number"]).columns
-    for col in numerical_cols:
-        if col not in [gv.SCORE]:
-            df_features[col] = df_features[col].apply(
-                lambda x: nm.numerize(x) if pd.notnull(x) else x
-            )
+    return df_scores, df_features
 
-    if gv.MARKET_CAP in df_scores.columns:
-        df_scores[gv.MARKET_CAP] = df_scores[gv.MARKET_CAP].apply(
-            lambda x: nm.numerize(x) if pd.notnull(x) else x
-        )
+
+def add_trend_features(
+    df_scores: pd.DataFrame,
+    df_features: pd.DataFrame,
+    n: int,
+    weights: dict | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Adds the regression trend conditions of FCF, OCF and revenue over the last n years
+    to df_scores and their slope, R² and CAGR to df_features. Continuous columns with
+    a score weight are also added to df_scores, so that calculate_score can use them.
+    """
+    df_trends = get_trend_features(df_scores["ticker"].tolist(), n)
+    condition_cols = df_trends.select_dtypes(include="bool").columns.tolist()
+    continuous_cols = [
+        col for col in df_trends.columns if col not in condition_cols + ["ticker"]
+    ]
+    weighted_cols = [col for col in continuous_cols if col in (weights or {})]
+    df_scores = pd.merge(
+        df_scores,
+        df_trends[["ticker"] + condition_cols + weighted_cols],
+        on="ticker",
+        how="left",
+    )
+    df_features = pd.merge(
+        df_features, df_trends[["ticker"] + continuous_cols], on="ticker", how="left"
+    )
+    return df_scores, df_features
+
+
+def update_results_with_universe_diff(
+    df_scores: pd.DataFrame,
+    df_features: pd.DataFrame,
+    universe_diff: dict,
+    screener_parameters: dict,
+    available_tickers: list[str] | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Updates previously computed screener results after a universe refresh, processing
+    only the added tickers instead of the whole universe. Reclassified tickers
+    already in the results only get their Sector, Industry and Country updated.
+
+    Args:
+        df_scores (pd.DataFrame): Previous output of process_tickers.
+        df_features (pd.DataFrame): Previous output of process_tickers.
+        universe_diff (dict): Diff returned by get_all_ticker_from_finviz or
+                              load_universe_diff.
+        screener_parameters (dict): Parameters used to compute the previous results.
+        available_tickers (list[str] | None): Tickers with statement data. If given,
+                                              affected tickers outside it are skipped.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The updated df_scores and df_features,
+            sorted by score in descending order.
+    """
+    changed = universe_diff.get(gv.CHANGED_TICKERS, {})
+    processed = set(df_scores["ticker"]) if not df_scores.empty else set()
+    # reclassified tickers missing from the results are processed like added ones
+    tickers_to_process = sorted(
+        set(get_tickers_affected_by_diff(universe_diff))
+        | {t for t in changed if t not in processed}
+    )
+    if available_tickers is not None:
+        available = set(available_tickers)
+        tickers_to_process = [t for t in tickers_to_process if t in available]
+    tickers_to_drop = set(tickers_to_process) | set(
+        universe_diff.get(gv.REMOVED_TICKERS, [])
+    )
+
+    if not df_scores.empty:
+        df_scores = df_scores[~df_scores["ticker"].isin(tickers_to_drop)]
+    if not df_features.empty:
+        df_features = df_features[~df_features["ticker"].isin(tickers_to_drop)]
+    df_scores = apply_universe_changes(df_scores, changed)
+    df_features = apply_universe_changes(df_features, changed)
+
+    df_scores_new, df_features_new = process_tickers(
+        tickers_to_process, screener_parameters
+    )
+
+    df_scores = pd.concat([df_scores, df_scores_new], ignore_index=True)
+    df_features = pd.concat([df_features, df_features_new], ignore_index=True)
+    if gv.SCORE in df_scores.columns:
+        df_scores = df_scores.sort_values(by=gv.SCORE, ascending=False)
+    if gv.SCORE in df_features.columns:
+        df_features = df_features.sort_values(by=gv.SCORE, ascending=False)
 
     return df_scores, df_features
 
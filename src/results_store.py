@@ -0,0 +1,142 @@
+import json
+import os
+import shutil
+from datetime import datetime
+import pandas as pd
+
+from src.fmp.fmp_panel import get_universe_stat
+import src.global_variables as gv
+
+# number of result snapshots kept on disk
+KEEP_RESULTS_SNAPSHOTS = 3
+# snapshots of another format (e.g. with numerized values) are ignored
+RESULTS_FORMAT = 2
+
+_RESULTS_CACHE = {}
+
+
+def get_latest_results_version() -> str | None:
+    """
+    Returns the id of the latest published results snapshot, or None.
+    Reading it only opens a small pointer file, so it can be polled cheaply.
+    """
+    try:
+        with open(gv.RESULTS_LATEST_FILE, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish_results(
+    df_scores: pd.DataFrame,
+    df_features: pd.DataFrame,
+    screener_parameters: dict,
+    data_version: str,
+    signatures: dict | None = None,
+) -> str:
+    """
+    Saves the screener results as a new snapshot under RESULTS_DIR/<snapshot>/ and
+    atomically points RESULTS_LATEST_FILE to it.
+
+    Args:
+        df_scores (pd.DataFrame): Scores, as returned by process_tickers.
+        df_features (pd.DataFrame): Features, as returned by process_tickers.
+        screener_parameters (dict): Parameters used to compute the results.
+        data_version (str): Version of the data the results were computed from.
+        signatures (dict | None): Statement signatures of the data (see
+                                  scan_statement_signatures), stored so that readers
+                                  can detect the tickers that changed since.
+    Returns:
+        str: The snapshot id.
+    """
+    snapshot = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{data_version}"
+    snapshot_dir = os.path.join(gv.RESULTS_DIR, snapshot)
+    tmp_dir = f"{snapshot_dir}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    df_scores.to_csv(os.path.join(tmp_dir, "scores.csv"), index=False)
+    df_features.to_csv(os.path.join(tmp_dir, "features.csv"), index=False)
+    metadata = {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "data_version": data_version,
+        "screener_parameters": screener_parameters,
+        "tickers": len(df_scores),
+        "format": RESULTS_FORMAT,
+        "universe_stat": get_universe_stat(),
+    }
+    with open(os.path.join(tmp_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=4)
+    if signatures is not None:
+        with open(os.path.join(tmp_dir, "signatures.json"), "w") as f:
+            json.dump(signatures, f)
+    os.replace(tmp_dir, snapshot_dir)
+
+    tmp_pointer = f"{gv.RESULTS_LATEST_FILE}.tmp"
+    with open(tmp_pointer, "w") as f:
+        f.write(snapshot)
+    os.replace(tmp_pointer, gv.RESULTS_LATEST_FILE)
+
+    snapshots = sorted(
+        entry.name
+        for entry in os.scandir(gv.RESULTS_DIR)
+        if entry.is_dir() and not entry.name.endswith(".tmp")
+    )
+    for old_snapshot in snapshots[:-KEEP_RESULTS_SNAPSHOTS]:
+        shutil.rmtree(os.path.join(gv.RESULTS_DIR, old_snapshot), ignore_errors=True)
+
+    print(f"Results snapshot {snapshot} published ({len(df_scores)} tickers).")
+    return snapshot
+
+
+def load_results(
+    snapshot: str | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, dict] | None:
+    """
+    Loads a results snapshot (the latest one by default). The last loaded snapshot
+    is kept in memory, the returned DataFrames must not be modified in place.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, dict] | None: df_scores, df_features and the
+            snapshot metadata (with the stored "signatures", or None), or None if no
+            snapshot is available or it has an outdated format.
+    """
+    if snapshot is None:
+        snapshot = get_latest_results_version()
+    if snapshot is None:
+        return None
+    if snapshot in _RESULTS_CACHE:
+        return _RESULTS_CACHE[snapshot]
+    snapshot_dir = os.path.join(gv.RESULTS_DIR, snapshot)
+    try:
+        df_scores = pd.read_csv(os.path.join(snapshot_dir, "scores.csv"))
+        df_features = pd.read_csv(os.path.join(snapshot_dir, "features.csv"))
+        with open(os.path.join(snapshot_dir, "metadata.json"), "r") as f:
+            metadata = json.load(f)
+        signatures_file = os.path.join(snapshot_dir, "signatures.json")
+        metadata["signatures"] = None
+        if os.path.exists(signatures_file):
+            with open(signatures_file, "r") as f:
+                metadata["signatures"] = {
+                    t: tuple(tuple(s) if s is not None else None for s in sig)
+                    for t, sig in json.load(f).items()
+                }
+    except (FileNotFoundError, json.JSONDecodeError, pd.errors.EmptyDataError) as e:
+        print(f"Error loading results snapshot {snapshot}: {e}")
+        return None
+    if metadata.get("format") != RESULTS_FORMAT:
+        print(f"Results snapshot {snapshot} has an outdated format, ignored.")
+        return None
+    metadata["snapshot"] = snapshot
+    _RESULTS_CACHE.clear()
+    _RESULTS_CACHE[snapshot] = (df_scores, df_features, metadata)
+    return _RESULTS_CACHE[snapshot]
+
+
+if __name__ == "__main__":
+    results = load_results()
+    if results is None:
+        print("No results snapshot published yet.")
+    else:
+        df_scores_latest, _, metadata_latest = results
+        print(metadata_latest)
+        print(df_scores_latest.head(20))
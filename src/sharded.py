@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+import zlib
+from typing import List
+import pandas as pd
+
+from src.fmp.fmp_panel import list_available_tickers
+from src.main import process_tickers
+import src.global_variables as gv
+
+LOCAL_LAUNCHER = "{command}"
+# seconds an attempt may run before its unfinished workers are killed and retried
+SHARD_TIMEOUT = 3600.0
+
+
+def shard_of(ticker: str, n_shards: int) -> int:
+    """
+    Stable shard of a ticker. crc32 is used instead of hash() so that every
+    process and host agrees on the partition.
+    """
+    return zlib.crc32(ticker.encode()) % n_shards
+
+
+def partition_tickers(tickers: List[str], n_shards: int) -> List[List[str]]:
+    shards = [[] for _ in range(n_shards)]
+    for ticker in tickers:
+        shards[shard_of(ticker, n_shards)].append(ticker)
+    return shards
+
+
+def _shard_files(output_dir: str, shard_id: int) -> dict:
+    return {
+        "scores": os.path.join(output_dir, f"scores_{shard_id}.csv"),
+        "features": os.path.join(output_dir, f"features_{shard_id}.csv"),
+        "success": os.path.join(output_dir, f"_SUCCESS_{shard_id}"),
+    }
+
+
+def run_shard(
+    shard_id: int,
+    n_shards: int,
+    tickers: List[str],
+    screener_parameters: dict,
+    output_dir: str,
+):
+    """
+    Runs process_tickers on the tickers of one shard and writes the partial results
+    to output_dir. The success marker is written last, so a shard without marker
+    is incomplete.
+    """
+    files = _shard_files(output_dir, shard_id)
+    if os.path.exists(files["success"]):
+        os.remove(files["success"])
+
+    shard_tickers = partition_tickers(tickers, n_shards)[shard_id]
+    print(f"Shard {shard_id}/{n_shards}: processing {len(shard_tickers)} tickers.")
+    df_scores, df_features = process_tickers(shard_tickers, screener_parameters)
+
+    df_scores.to_csv(files["scores"], index=False)
+    df_features.to_csv(files["features"], index=False)
+    with open(files["success"], "w") as f:
+        json.dump({"shard_id": shard_id, "tickers": len(df_scores)}, f)
+
+
+def merge_shard_results(
+    output_dir: str, n_shards: int
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Concatenates the partial results of all shards and applies the global ranking.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: df_scores (with a 'rank' column, 1 = best
+            score) and df_features, sorted by score in descending order.
+    """
+    scores, features = [], []
+    for shard_id in range(n_shards):
+        files = _shard_files(output_dir, shard_id)
+        for file_path, frames in (
+            (files["scores"], scores),
+            (files["features"], features),
+        ):
+            try:
+                frames.append(pd.read_csv(file_path))
+            except pd.errors.EmptyDataError:
+                continue
+
+    df_scores = pd.concat(scores, ignore_index=True) if scores else pd.DataFrame()
+    df_features = pd.concat(features, ignore_index=True) if features else pd.DataFrame()
+    if gv.SCORE in df_scores.columns:
+        df_scores = df_scores.sort_values(by=gv.SCORE, ascending=False)
+        df_scores.insert(
+            0, gv.RANK, df_scores[gv.SCORE].rank(method="min", ascending=False)
+        )
+        df_scores[gv.RANK] = df_scores[gv.RANK].astype(int)
+    if gv.SCORE in df_features.columns:
+        df_features = df_features.sort_values(by=gv.SCORE, ascending=False)
+    return df_scores, df_features
+
+
+def run_sharded(
+    screener_parameters: dict,
+    n_shards: int,
+    output_dir: str,
+    tickers: List[str] | None = None,
+    max_attempts: int = 3,
+    launcher: str = LOCAL_LAUNCHER,
+    shard_timeout: float | None = SHARD_TIMEOUT,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Coordinator: runs every shard in a separate worker process, re-executes the
+    shards that failed or timed out and merges the partial results.
+
+    Args:
+        screener_parameters (dict): Parameters passed to process_tickers.
+        n_shards (int): Number of shards (and of concurrent workers).
+        output_dir (str): Directory shared by coordinator and workers.
+        tickers (List[str] | None): Universe to screen, all available tickers by default.
+        max_attempts (int): Maximum number of executions of each shard.
+        launcher (str): Shell template used to start a worker, with the {command}
+                        and {shard_id} placeholders, e.g.
+                        "ssh node{shard_id} 'cd /srv/screener && {command}'".
+                        By default workers are local processes.
+        shard_timeout (float | None): Seconds after which the workers of an attempt
+                                      still running are killed and their shards
+                                      retried. None waits forever.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The merged df_scores and df_features.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if tickers is None:
+        tickers = list_available_tickers()
+    # the inputs are passed as files, so that the command holds no quoted JSON and
+    # can be embedded in a quoted launcher template
+    tickers_file = os.path.join(output_dir, "tickers.json")
+    with open(tickers_file, "w") as f:
+        json.dump(tickers, f)
+    params_file = os.path.join(output_dir, "params.json")
+    with open(params_file, "w") as f:
+        json.dump(screener_parameters, f)
+
+    pending = list(range(n_shards))
+    for attempt in range(1, max_attempts + 1):
+        processes = {}
+        for shard_id in pending:
+            success_file = _shard_files(output_dir, shard_id)["success"]
+            if os.path.exists(success_file):
+                os.remove(success_file)
+            command = " ".join(
+                shlex.quote(arg)
+                for arg in [
+                    sys.executable,
+                    "-m",
+                    "src.sharded",
+                    "worker",
+                    "--shard-id",
+                    str(shard_id),
+                    "--n-shards",
+                    str(n_shards),
+                    "--output-dir",
+                    output_dir,
+                    "--tickers-file",
+                    tickers_file,
+                    "--params-file",
+                    params_file,
+                ]
+            )
+            processes[shard_id] = subprocess.Popen(
+                launcher.format(command=command, shard_id=shard_id),
+                shell=True,
+                cwd=gv.MAIN_DIR,
+                # own process group, so that a timed out worker is killed with
+                # the processes started by the launcher (e.g. ssh)
+                start_new_session=True,
+            )
+
+        deadline = None if shard_timeout is None else time.monotonic() + shard_timeout
+        failed = []
+        for shard_id, process in processes.items():
+            try:
+                timeout = (
+                    None if deadline is None else max(0, deadline - time.monotonic())
+                )
+                return_code = process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                print(f"Shard {shard_id} timed out after {shard_timeout}s, killed.")
+                _kill_worker(process)
+                failed.append(shard_id)
+                continue
+            success_file = _shard_files(output_dir, shard_id)["success"]
+            if return_code != 0 or not os.path.exists(success_file):
+                failed.append(shard_id)
+        if not failed:
+            break
+        print(f"Attempt {attempt}: shards {failed} failed.")
+        pending = failed
+    else:
+        raise RuntimeError(
+            f"Shards {pending} failed after {max_attempts} attempts, see worker logs."
+        )
+
+    return merge_shard_results(output_dir, n_shards)
+
+
+def _kill_worker(process: subprocess.Popen):
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded screening.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    worker_parser = subparsers.add_parser("worker", help="Run one shard.")
+    worker_parser.add_argument("--shard-id", type=int, required=True)
+    worker_parser.add_argument("--n-shards", type=int, required=True)
+    worker_parser.add_argument("--output-dir", required=True)
+    worker_parser.add_argument("--tickers-file")
+    worker_parser.add_argument("--params-file")
+
+    coordinator_parser = subparsers.add_parser("run", help="Run all shards and merge.")
+    coordinator_parser.add_argument("--n-shards", type=int, default=os.cpu_count())
+    coordinator_parser.add_argument("--output-dir", required=True)
+    coordinator_parser.add_argument("--fcf-years", type=int, default=3)
+    coordinator_parser.add_argument("--ocf-years", type=int, default=3)
+    coordinator_parser.add_argument(
+        "--trend-years",
+        type=int,
+        default=0,
+        help="Years of the regression trend criteria (0: disabled).",
+    )
+    coordinator_parser.add_argument(
+        "--score-weights",
+        type=json.loads,
+        help="JSON weights of continuous columns, e.g. '{\"FCF Trend Slope\": 2.0}'.",
+    )
+    coordinator_parser.add_argument("--max-attempts", type=int, default=3)
+    coordinator_parser.add_argument("--launcher", default=LOCAL_LAUNCHER)
+    coordinator_parser.add_argument(
+        "--shard-timeout",
+        type=float,
+        default=SHARD_TIMEOUT,
+        help="Seconds before unfinished workers are killed and retried (0: no limit).",
+    )
+
+    args = parser.parse_args()
+    if args.mode == "worker":
+        if args.tickers_file:
+            with open(args.tickers_file, "r") as f:
+                worker_tickers = json.load(f)
+        else:
+            worker_tickers = list_available_tickers()
+        worker_params = {}
+        if args.params_file:
+            with open(args.params_file, "r") as f:
+                worker_params = json.load(f)
+        run_shard(
+            args.shard_id,
+            args.n_shards,
+            worker_tickers,
+            worker_params,
+            args.output_dir,
+        )
+    else:
+        run_parameters = {gv.FCF_YEARS: args.fcf_years, gv.OCF_YEARS: args.ocf_years}
+        if args.trend_years:
+            run_parameters[gv.TREND_YEARS] = args.trend_years
+        if args.score_weights:
+            run_parameters[gv.SCORE_WEIGHTS] = args.score_weights
+        df_scores_merged, _ = run_sharded(
+            run_parameters,
+            n_shards=args.n_shards,
+            output_dir=args.output_dir,
+            max_attempts=args.max_attempts,
+            launcher=args.launcher,
+            shard_timeout=args.shard_timeout or None,
+        )
+        merged_file = os.path.join(args.output_dir, "scores.csv")
+        df_scores_merged.to_csv(merged_file, index=False)
+        print(f"Merged {len(df_scores_merged)} tickers into {merged_file}")
@@ -5,6 +5,12 @@ import os
 from datetime import datetime
 
 from src.finviz.finviz_screener import get_df_with_all_tickers_information
+from src.fmp.fmp_shared_panel import attach_shared_universe
+from src.fmp.fmp_derived_metrics import (
+    DERIVED_METRICS,
+    load_derived_metrics,
+    refresh_derived_metrics,
+)
 import src.global_variables as gv
 from src.yfinance.yfinance_utils import YahooFinanceTickerInfo
 
@@ -58,7 +64,12 @@ def reorder_dataframes_columns(
 
 
 def add_ticker_info(df_scores, df_features):
-    df_info_stocks = get_df_with_all_tickers_information()
+    shared_universe = attach_shared_universe()
+    if shared_universe is not None and "ticker" in df_scores.columns:
+        # only copy the rows of the processed tickers out of the shared universe
+        df_info_stocks = shared_universe.lookup(df_scores["ticker"])
+    else:
+        df_info_stocks = get_df_with_all_tickers_information()
     df_scores = pd.merge(
         df_scores, df_info_stocks, left_on="ticker", right_on="Ticker", how="left"
     )
@@ -68,9 +79,44 @@ def add_ticker_info(df_scores, df_features):
     return df_scores, df_features, df_info_stocks
 
 
-def calculate_score(df_scores: pd.DataFrame) -> pd.DataFrame:
+def add_derived_metrics(df_features: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the most recent precomputed derived metrics (FCF margin, debt/equity, ROIC, ...)
+    to df_features. The metrics of tickers whose statement files changed (or that were
+    never computed) are refreshed first, which only costs os.stat calls otherwise.
+    """
+    if df_features.empty or "ticker" not in df_features.columns:
+        return df_features
+    tickers = df_features["ticker"].tolist()
+    refresh_derived_metrics(tickers)
+    df_derived = load_derived_metrics(tickers)
+    if df_derived.empty:
+        return df_features
+    return pd.merge(
+        df_features,
+        df_derived[["ticker"] + DERIVED_METRICS],
+        on="ticker",
+        how="left",
+    )
+
+
+def calculate_score(
+    df_scores: pd.DataFrame, weights: dict | None = None
+) -> pd.DataFrame:
+    """
+    Scores each ticker with the number of boolean criteria it meets.
+
+    Args:
+        df_scores (pd.DataFrame): Scores DataFrame with one boolean column per criterion.
+        weights (dict | None): Optional {column: weight} of continuous columns (e.g.
+                               regression trend slopes) added to the score as
+                               weight * value, missing values counting as 0.
+    """
     score_columns = df_scores.select_dtypes(include="bool").columns
     df_scores[gv.SCORE] = df_scores[score_columns].sum(axis=1)
+    for col, weight in (weights or {}).items():
+        if col in df_scores.columns:
+            df_scores[gv.SCORE] += weight * df_scores[col].fillna(0)
 
     # Reorder columns: 'score' should come before boolean columns
     non_score_and_bool_cols = [
@@ -83,37 +129,68 @@ def calculate_score(df_scores: pd.DataFrame) -> pd.DataFrame:
 
 
 def add_ticker_current_info(
-    df_scores: pd.DataFrame, progress_callback=None
+    df_scores: pd.DataFrame, progress_callback=None, refresher=None
 ) -> pd.DataFrame:
     """
     Adds multiple metrics (P/E, Insider Ownership, FCF, etc.) to the DataFrame
     by fetching data for each ticker efficiently.
+
+    If a YahooQuoteRefresher is given, its already fresh metrics are merged without
+    any network call (tickers without fresh data get NaN) and the tickers are marked
+    as viewed so that they are refreshed first.
     """
-    metrics_list = []
     tickers = df_scores["ticker"].tolist()
     total_tickers = len(tickers)
 
-    for i, ticker in enumerate(tickers):
-        stock_obj = YahooFinanceTickerInfo(ticker)
-        metrics_list.append(stock_obj.get_all_metrics())
-
+    if refresher is not None:
+        refresher.mark_viewed(tickers)
+        metrics_df = refresher.get_metrics(tickers).drop(columns=["ticker"])
+        metrics_df = metrics_df.reindex(
+            columns=list(YahooFinanceTickerInfo.METRICS_COLUMNS)
+        )
         if progress_callback:
-            progress_callback((i + 1) / total_tickers)
+            progress_callback(1.0)
+    else:
+        metrics_list = []
+        for i, ticker in enumerate(tickers):
+            stock_obj = YahooFinanceTickerInfo(ticker)
+            metrics_list.append(stock_obj.get_all_metrics())
+
+            if progress_callback:
+                progress_callback((i + 1) / total_tickers)
 
-    metrics_df = pd.DataFrame(metrics_list)
+        metrics_df = pd.DataFrame(metrics_list)
 
     metrics_df.index = df_scores.index
 
     df_scores = pd.concat([df_scores, metrics_df], axis=1)
 
-    if gv.MARKET_CAP in df_scores.columns:
-        df_scores[gv.MARKET_CAP] = df_scores[gv.MARKET_CAP].apply(
-            lambda x: nm.numerize(x) if pd.notnull(x) else x
-        )
-
     return df_scores
 
 
+def numerize_columns(
+    df: pd.DataFrame, columns: list[str] | None = None
+) -> pd.DataFrame:
+    """
+    Returns a copy of the DataFrame for display, with large numbers shortened
+    (e.g. 1.5B). Results are kept numeric everywhere else.
+
+    Args:
+        df (pd.DataFrame): Numeric results, e.g. as returned by process_tickers.
+        columns (list[str] | None): Columns to shorten, all numeric columns except
+                                    the score by default.
+    """
+    if columns is None:
+        columns = df.select_dtypes(include=["number"]).columns.drop(
+            gv.SCORE, errors="ignore"
+        )
+    df = df.copy()
+    for col in columns:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: nm.numerize(x) if pd.notnull(x) else x)
+    return df
+
+
 def save_tickers_blacklist(df_score: pd.DataFrame, threshold: float):
     """
     Saves tickers from df_score that have a score less than the threshold
@@ -0,0 +1,288 @@
+import argparse
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+from src.fmp.fmp_cashflow import align_cashflow_years
+from src.fmp.fmp_panel import StatementPanel, get_data_version, get_statement_panel
+from src.yfinance.yfinance_refresher import load_cached_metrics
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+import src.global_variables as gv
+
+# default scenario grid: 10 discount rates x 5 terminal growth rates
+DEFAULT_DISCOUNT_RATES = np.round(np.linspace(0.06, 0.15, 10), 4)
+DEFAULT_TERMINAL_GROWTH_RATES = np.round(np.linspace(0.0, 0.04, 5), 4)
+# years of explicit FCF projection before the terminal value
+PROJECTION_YEARS = 5
+# historical growth is bounded before being projected
+MIN_GROWTH = -0.2
+MAX_GROWTH = 0.3
+
+_DCF_CACHE = {}
+
+
+def estimate_fcf_growth(fcf: np.ndarray, n: int = 3) -> np.ndarray:
+    """
+    Compound annual growth of the FCF over the last n years, for every row of a
+    (n_tickers, PANEL_YEARS) array, clipped to [MIN_GROWTH, MAX_GROWTH].
+
+    The CAGR is not defined when the first or last value is missing or not positive,
+    these tickers get 0 growth.
+    """
+    n = max(2, min(n, fcf.shape[1]))
+    first = fcf[:, -n]
+    last = fcf[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = (last / first) ** (1.0 / (n - 1)) - 1.0
+    cagr[~np.isfinite(cagr) | (first <= 0) | (last <= 0)] = 0.0
+    return np.clip(cagr, MIN_GROWTH, MAX_GROWTH)
+
+
+def discounted_cash_flow(
+    fcf_base: np.ndarray,
+    growth: np.ndarray,
+    discount_rates: np.ndarray,
+    terminal_growth_rates: np.ndarray,
+    years: int = PROJECTION_YEARS,
+) -> np.ndarray:
+    """
+    Present value of the projected FCF of every ticker under every scenario, as one
+    broadcasted computation.
+
+    FCF grows at the ticker growth rate for the projection years, then at the
+    terminal growth rate forever (Gordon growth terminal value).
+
+    Args:
+        fcf_base (np.ndarray): (n_tickers,) last FCF.
+        growth (np.ndarray): (n_tickers,) projected annual growth.
+        discount_rates (np.ndarray): (n_rates,) discount rates.
+        terminal_growth_rates (np.ndarray): (n_terminal,) terminal growth rates.
+        years (int): Number of projected years.
+    Returns:
+        np.ndarray: (n_tickers, n_rates, n_terminal) values, NaN for scenarios with
+            a terminal growth not lower than the discount rate.
+    """
+    r = np.asarray(discount_rates, dtype=float)
+    tg = np.asarray(terminal_growth_rates, dtype=float)
+    t = np.arange(1, years + 1)
+
+    # (n_tickers, years) projected FCF and (n_rates, years) discount factors
+    projected = fcf_base[:, None] * (1.0 + growth[:, None]) ** t
+    discount = (1.0 + r[:, None]) ** -t
+    explicit_value = projected @ discount.T
+
+    spread = r[:, None] - tg[None, :]
+    valid = spread > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terminal_factor = np.where(
+            valid, (1.0 + tg[None, :]) / spread * discount[:, -1:], np.nan
+        )
+    terminal_value = projected[:, -1, None, None] * terminal_factor[None, :, :]
+    return explicit_value[:, :, None] + terminal_value
+
+
+class DcfValuation:
+    """
+    Intrinsic value of every ticker of the universe under a grid of discount rates
+    and terminal growth rates.
+
+    The FCF reported by FMP is after interest, so the discounted value is taken as
+    the equity value and compared to the market cap directly. Tickers with a missing
+    or negative last FCF, or without share count, are valued NaN.
+    """
+
+    def __init__(
+        self,
+        tickers: list[str],
+        discount_rates: np.ndarray,
+        terminal_growth_rates: np.ndarray,
+        growth: np.ndarray,
+        intrinsic_value: np.ndarray,
+        shares: np.ndarray,
+    ):
+        self.tickers = tickers
+        self.discount_rates = np.asarray(discount_rates, dtype=float)
+        self.terminal_growth_rates = np.asarray(terminal_growth_rates, dtype=float)
+        self.growth = growth
+        self.intrinsic_value = intrinsic_value
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.value_per_share = intrinsic_value / shares[:, None, None]
+        self.value_per_share[~np.isfinite(self.value_per_share)] = np.nan
+
+    def margin_of_safety(self, market_caps: pd.Series) -> np.ndarray:
+        """
+        (intrinsic value - market cap) / intrinsic value for every ticker and
+        scenario.
+
+        Args:
+            market_caps (pd.Series): Market caps indexed by ticker, tickers missing
+                                     from it get NaN.
+        Returns:
+            np.ndarray: (n_tickers, n_rates, n_terminal) margins of safety.
+        """
+        market_caps = pd.to_numeric(market_caps, errors="coerce")
+        market_caps = market_caps[~market_caps.index.duplicated()]
+        caps = market_caps.reindex(self.tickers).to_numpy(dtype=float, copy=True)
+        caps[caps <= 0] = np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 1.0 - caps[:, None, None] / self.intrinsic_value
+
+    def get_scenario(
+        self,
+        discount_rate: float,
+        terminal_growth_rate: float,
+        market_caps: pd.Series | None = None,
+    ) -> pd.DataFrame:
+        """
+        Returns the valuation of every ticker for the grid scenario closest to the
+        given rates, indexed by ticker.
+        """
+        i = int(np.abs(self.discount_rates - discount_rate).argmin())
+        j = int(np.abs(self.terminal_growth_rates - terminal_growth_rate).argmin())
+        df = pd.DataFrame(
+            {
+                gv.DCF_GROWTH: self.growth,
+                gv.INTRINSIC_VALUE: self.intrinsic_value[:, i, j],
+                gv.INTRINSIC_VALUE_PER_SHARE: self.value_per_share[:, i, j],
+            },
+            index=pd.Index(self.tickers, name="ticker"),
+        )
+        if market_caps is not None:
+            df[gv.MARGIN_OF_SAFETY] = self.margin_of_safety(market_caps)[:, i, j]
+        return df
+
+    def summarize(self, market_caps: pd.Series | None = None) -> pd.DataFrame:
+        """
+        Returns the median, minimum and maximum value per share over the grid and,
+        when market caps are given, the median margin of safety and the share of
+        scenarios in which the ticker is undervalued. Indexed by ticker.
+        """
+        flat_value = self.value_per_share.reshape(len(self.tickers), -1)
+        # all-NaN rows (tickers without a valuation) make nanmedian warn
+        with np.errstate(invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            df = pd.DataFrame(
+                {
+                    gv.DCF_GROWTH: self.growth,
+                    gv.INTRINSIC_VALUE_PER_SHARE: np.nanmedian(flat_value, axis=1),
+                    f"{gv.INTRINSIC_VALUE_PER_SHARE} min": np.nanmin(
+                        flat_value, axis=1
+                    ),
+                    f"{gv.INTRINSIC_VALUE_PER_SHARE} max": np.nanmax(
+                        flat_value, axis=1
+                    ),
+                },
+                index=pd.Index(self.tickers, name="ticker"),
+            )
+            if market_caps is not None:
+                flat_margin = self.margin_of_safety(market_caps).reshape(
+                    len(self.tickers), -1
+                )
+                n_scenarios = np.sum(~np.isnan(flat_margin), axis=1)
+                df[gv.MARGIN_OF_SAFETY] = np.nanmedian(flat_margin, axis=1)
+                df[gv.UNDERVALUED_SCENARIOS] = np.where(
+                    n_scenarios > 0,
+                    np.sum(flat_margin > 0, axis=1) / np.maximum(n_scenarios, 1),
+                    np.nan,
+                )
+        return df
+
+
+def value_universe(
+    panel: StatementPanel,
+    discount_rates: np.ndarray = DEFAULT_DISCOUNT_RATES,
+    terminal_growth_rates: np.ndarray = DEFAULT_TERMINAL_GROWTH_RATES,
+    growth_years: int = 3,
+    years: int = PROJECTION_YEARS,
+) -> DcfValuation:
+    """
+    Values every ticker of the statement panel under every scenario of the grid, from
+    its last cash flow years.
+
+    Args:
+        panel (StatementPanel): Statement data of the universe.
+        discount_rates (np.ndarray): Discount rates of the grid.
+        terminal_growth_rates (np.ndarray): Terminal growth rates of the grid.
+        growth_years (int): Number of years used for the historical FCF growth.
+        years (int): Number of projected years.
+    Returns:
+        DcfValuation: The valuation grid.
+    """
+    # last cash flow years of each ticker, even when its income statement already
+    # has a later year, and the share count of the same years
+    aligned = align_cashflow_years(
+        panel,
+        np.arange(len(panel)),
+        [fmp_gv.freeCashFlow, fmp_gv.shares_outstanding],
+    )
+    fcf = aligned[fmp_gv.freeCashFlow]
+    fcf_base = fcf[:, -1].copy()
+    # no meaningful DCF without a positive current FCF
+    fcf_base[~(fcf_base > 0)] = np.nan
+    shares = aligned[fmp_gv.shares_outstanding][:, -1].copy()
+    shares[~(shares > 0)] = np.nan
+    growth = estimate_fcf_growth(fcf, growth_years)
+
+    intrinsic_value = discounted_cash_flow(
+        fcf_base, growth, discount_rates, terminal_growth_rates, years
+    )
+    return DcfValuation(
+        list(panel.tickers),
+        discount_rates,
+        terminal_growth_rates,
+        growth,
+        intrinsic_value,
+        shares,
+    )
+
+
+def get_dcf_valuation(
+    growth_years: int = 3, data_version: str | None = None
+) -> DcfValuation:
+    """
+    Returns the DcfValuation of the whole universe with the default grid, computing
+    it only once per (data version, growth years).
+    """
+    if data_version is None:
+        data_version = get_data_version()
+    key = (data_version, growth_years)
+    valuation = _DCF_CACHE.get(key)
+    if valuation is None:
+        valuation = value_universe(
+            get_statement_panel(data_version), growth_years=growth_years
+        )
+        # another session may clear the cache meanwhile: return the local valuation
+        _DCF_CACHE.clear()
+        _DCF_CACHE[key] = valuation
+    return valuation
+
+
+def get_cached_market_caps(tickers: list[str]) -> pd.Series:
+    """
+    Market caps from the YahooQuoteRefresher cache, without any network call and
+    whatever their age. Indexed by ticker.
+    """
+    df_metrics = load_cached_metrics(tickers)
+    if gv.MARKET_CAP not in df_metrics.columns:
+        return pd.Series(np.nan, index=tickers, dtype=float)
+    return df_metrics.set_index("ticker")[gv.MARKET_CAP]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DCF valuation of the universe.")
+    parser.add_argument("--growth-years", type=int, default=3)
+    parser.add_argument(
+        "--output", default=os.path.join(gv.DATA_DIR, "dcf_valuation.csv")
+    )
+    args = parser.parse_args()
+
+    valuation = get_dcf_valuation(growth_years=args.growth_years)
+    df_summary = valuation.summarize(get_cached_market_caps(valuation.tickers))
+    df_summary.sort_values(by=gv.MARGIN_OF_SAFETY, ascending=False).to_csv(args.output)
+    print(
+        f"Valued {df_summary[gv.INTRINSIC_VALUE_PER_SHARE].notna().sum()} of "
+        f"{len(df_summary)} tickers over "
+        f"{valuation.intrinsic_value.shape[1] * valuation.intrinsic_value.shape[2]} "
+        f"scenarios, saved to {args.output}"
+    )
@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import time
+import pandas as pd
+
+from src.finviz.finviz_screener import (
+    compute_universe_diff,
+    get_df_with_all_tickers_information,
+    get_tickers_affected_by_diff,
+    list_universe_snapshots,
+    load_universe_diff,
+)
+from src.fmp.fmp_derived_metrics import refresh_derived_metrics
+from src.fmp.fmp_panel import (
+    get_data_version,
+    get_statement_signature,
+    get_universe_stat,
+    list_available_tickers,
+    load_statement_panel,
+    scan_statement_signatures,
+)
+from src.fmp.fmp_shared_panel import attach_shared_panel, publish_shared_data
+from src.main import process_tickers, update_results_with_universe_diff
+from src.results_store import load_results, publish_results
+from src.utils import add_ticker_info, reorder_dataframes_columns
+import src.global_variables as gv
+
+
+class DataWatcher:
+    """
+    Polls the FMP data tree and the finviz universe file and, when something changed,
+    rescores only the affected tickers and publishes a new results snapshot.
+
+    Changes are detected from (mtime, size) of the files, so a poll without changes
+    only costs os.stat calls. The last seen index is saved to WATCH_INDEX_FILE to
+    survive restarts.
+    """
+
+    def __init__(self, screener_parameters: dict):
+        self.screener_parameters = screener_parameters
+        self.signatures, self.universe_stat, self.universe_snapshot = self._load_index()
+        self.df_universe = None
+
+    @staticmethod
+    def _load_index() -> tuple[dict, list | None, str | None]:
+        if not os.path.exists(gv.WATCH_INDEX_FILE):
+            return {}, None, None
+        try:
+            with open(gv.WATCH_INDEX_FILE, "r") as f:
+                index = json.load(f)
+        except json.JSONDecodeError:
+            return {}, None, None
+        signatures = {
+            t: tuple(tuple(s) if s is not None else None for s in sig)
+            for t, sig in index.get("signatures", {}).items()
+        }
+        return (
+            signatures,
+            index.get("universe_stat"),
+            index.get("universe_snapshot"),
+        )
+
+    def _save_index(self):
+        tmp_file = f"{gv.WATCH_INDEX_FILE}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(
+                {
+                    "signatures": self.signatures,
+                    "universe_stat": self.universe_stat,
+                    # last universe snapshot applied, cursor of load_universe_diff
+                    "universe_snapshot": self.universe_snapshot,
+                },
+                f,
+            )
+        os.replace(tmp_file, gv.WATCH_INDEX_FILE)
+
+    def _get_universe_diff(self) -> dict:
+        """
+        Diff between the universe seen at the previous poll and the current one.
+        """
+        df_universe = get_df_with_all_tickers_information()
+        snapshots = list_universe_snapshots()
+        if self.df_universe is None:
+            # first poll after a restart: combine the diffs of all the refreshes
+            # since the last applied snapshot, or process every ticker if unknown
+            if self.universe_snapshot is None:
+                diff = {gv.ADDED_TICKERS: df_universe["Ticker"].tolist()}
+            else:
+                diff = load_universe_diff(since_snapshot=self.universe_snapshot)
+        else:
+            diff = compute_universe_diff(self.df_universe, df_universe)
+        self.df_universe = df_universe
+        if snapshots:
+            self.universe_snapshot = snapshots[-1]
+        return diff
+
+    def poll(self) -> str | None:
+        """
+        Checks the data once and publishes a new results snapshot if anything changed.
+
+        Returns:
+            str | None: The published snapshot id, or None if nothing changed.
+        """
+        available_tickers = list_available_tickers()
+        signatures = scan_statement_signatures(available_tickers)
+        changed = [t for t, sig in signatures.items() if self.signatures.get(t) != sig]
+        removed = [t for t in self.signatures if t not in signatures]
+
+        universe_stat = get_universe_stat()
+        universe_diff = {}
+        if universe_stat is not None and universe_stat != self.universe_stat:
+            universe_diff = self._get_universe_diff()
+        has_universe_changes = any(
+            universe_diff.get(key)
+            for key in (gv.ADDED_TICKERS, gv.REMOVED_TICKERS, gv.CHANGED_TICKERS)
+        )
+
+        results = load_results()
+        if results is not None and (
+            results[2].get("screener_parameters") != self.screener_parameters
+        ):
+            results = None
+        if (
+            not changed
+            and not removed
+            and not has_universe_changes
+            and results is not None
+        ):
+            if universe_stat != self.universe_stat:
+                # universe file touched without changes: do not diff it again
+                self.universe_stat = universe_stat
+                self._save_index()
+            return None
+
+        data_version = get_data_version(signatures)
+        if changed or removed:
+            # only the changed tickers: the others keep their derived metrics
+            refresh_derived_metrics(changed, signatures)
+        if changed or removed or has_universe_changes:
+            self._refresh_shared_panel(changed, removed, data_version, signatures)
+
+        if results is None:
+            print("No results snapshot for these parameters, processing all tickers.")
+            df_scores, df_features = process_tickers(
+                available_tickers, self.screener_parameters
+            )
+        else:
+            df_scores, df_features, _ = results
+            diff = {
+                gv.ADDED_TICKERS: sorted(
+                    set(changed) | set(get_tickers_affected_by_diff(universe_diff))
+                ),
+                gv.REMOVED_TICKERS: sorted(
+                    set(removed) | set(universe_diff.get(gv.REMOVED_TICKERS, []))
+                ),
+                gv.CHANGED_TICKERS: universe_diff.get(gv.CHANGED_TICKERS, {}),
+            }
+            print(
+                f"Rescoring {len(diff[gv.ADDED_TICKERS])} tickers, "
+                f"removing {len(diff[gv.REMOVED_TICKERS])}."
+            )
+            df_scores, df_features = update_results_with_universe_diff(
+                df_scores,
+                df_features,
+                diff,
+                self.screener_parameters,
+                available_tickers=available_tickers,
+            )
+
+        snapshot = publish_results(
+            df_scores, df_features, self.screener_parameters, data_version, signatures
+        )
+        self.signatures = signatures
+        self.universe_stat = universe_stat
+        self._save_index()
+        return snapshot
+
+    @staticmethod
+    def _refresh_shared_panel(
+        changed: list, removed: list, data_version: str, signatures: dict
+    ):
+        """
+        Republishes the shared data, if it is in use, so that the rescoring reads
+        the new statements. Only the changed tickers are read from disk.
+        """
+        # the published panel is stale for the changed tickers, replaced below
+        shared_panel = attach_shared_panel(check_fresh=False)
+        if shared_panel is None:
+            return
+        panel = shared_panel.update(load_statement_panel(changed), removed=removed)
+        df_universe = (
+            get_df_with_all_tickers_information()
+            if os.path.exists(gv.ALL_STOCKS_INFO_FILE)
+            else None
+        )
+        publish_shared_data(panel, df_universe, data_version, signatures)
+
+    def run(self, interval: float = 30.0):
+        print(f"Watching {gv.DATA_DIR} every {interval}s. Press Ctrl+C to stop.")
+        try:
+            while True:
+                try:
+                    self.poll()
+                except Exception as e:
+                    print(f"Error while processing data changes: {e}")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Watch stopped.")
+
+
+def get_results_for_tickers(
+    tickers: list[str], screener_parameters: dict
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Returns the screener results of the given tickers, taking them from the latest
+    published snapshot when it was computed with the same parameters.
+
+    Only the tickers missing from the snapshot or whose statement files changed after
+    it was computed are processed again, and the ticker information is merged again
+    when the universe file changed, so the results never lag behind the data.
+    """
+    results = load_results()
+    if (
+        not tickers
+        or results is None
+        or results[2].get("screener_parameters") != screener_parameters
+    ):
+        return process_tickers(tickers, screener_parameters)
+
+    df_scores, df_features, metadata = results
+    snapshot_signatures = metadata.get("signatures")
+    if snapshot_signatures is None:
+        # snapshot without signatures: usable only if no data changed at all
+        if metadata.get("data_version") != get_data_version():
+            return process_tickers(tickers, screener_parameters)
+        stale = set()
+    else:
+        stale = {
+            t
+            for t in tickers
+            if snapshot_signatures.get(t) != get_statement_signature(t)
+        }
+
+    df_scores = df_scores[
+        df_scores["ticker"].isin(tickers) & ~df_scores["ticker"].isin(stale)
+    ]
+    df_features = df_features[
+        df_features["ticker"].isin(tickers) & ~df_features["ticker"].isin(stale)
+    ]
+    if metadata.get("universe_stat") != get_universe_stat() and not df_scores.empty:
+        df_scores, df_features = _merge_current_ticker_info(df_scores, df_features)
+
+    processed = set(df_scores["ticker"])
+    missing = [t for t in tickers if t not in processed]
+    if missing:
+        df_scores_missing, df_features_missing = process_tickers(
+            missing, screener_parameters
+        )
+        df_scores = pd.concat([df_scores, df_scores_missing], ignore_index=True)
+        df_features = pd.concat([df_features, df_features_missing], ignore_index=True)
+        df_scores = df_scores.sort_values(by=gv.SCORE, ascending=False)
+        df_features = df_features.sort_values(by=gv.SCORE, ascending=False)
+    return df_scores, df_features
+
+
+def _merge_current_ticker_info(
+    df_scores: pd.DataFrame, df_features: pd.DataFrame
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Replaces the ticker information columns with the ones of the current universe.
+    """
+    info_cols = [col for col in gv.TICKER_INFO_COLUMNS if col != "Ticker"]
+    df_scores = df_scores.drop(columns=info_cols, errors="ignore")
+    df_features = df_features.drop(columns=info_cols, errors="ignore")
+    df_scores, df_features, df_info_stocks = add_ticker_info(df_scores, df_features)
+    return reorder_dataframes_columns(df_scores, df_features, df_info_stocks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rescore changed tickers when new data arrives."
+    )
+    parser.add_argument("--fcf-years", type=int, default=3)
+    parser.add_argument("--ocf-years", type=int, default=3)
+    parser.add_argument(
+        "--trend-years",
+        type=int,
+        default=0,
+        help="Years of the regression trend criteria (0: disabled).",
+    )
+    parser.add_argument(
+        "--score-weights",
+        type=json.loads,
+        help="JSON weights of continuous columns, e.g. '{\"FCF Trend Slope\": 2.0}'.",
+    )
+    parser.add_argument("--interval", type=float, default=30.0)
+    parser.add_argument("--once", action="store_true", help="Poll once and exit.")
+    args = parser.parse_args()
+
+    watch_parameters = {gv.FCF_YEARS: args.fcf_years, gv.OCF_YEARS: args.ocf_years}
+    if args.trend_years:
+        watch_parameters[gv.TREND_YEARS] = args.trend_years
+    if args.score_weights:
+        watch_parameters[gv.SCORE_WEIGHTS] = args.score_weights
+    watcher = DataWatcher(watch_parameters)
+    if args.once:
+        watcher.poll()
+    else:
+        watcher.run(interval=args.interval)
@@ -0,0 +1,289 @@
+import heapq
+import json
+import os
+import threading
+import time
+from typing import Callable, List
+import pandas as pd
+
+from src.yfinance.yfinance_utils import YahooFinanceTickerInfo
+import src.global_variables as gv
+
+# a ticker is refreshed again once its metrics are older than this
+DEFAULT_MAX_AGE = 6 * 3600
+# tickers passing the screen or recently viewed are refreshed more often
+PASSING_MAX_AGE_FACTOR = 0.5
+VIEWED_MAX_AGE_FACTOR = 0.25
+# priority boosts among due tickers, expressed as seconds of extra staleness
+PASSING_BOOST = 12 * 3600
+VIEWED_BOOST = 24 * 3600
+# tickers viewed within this window count as recently viewed
+VIEWED_WINDOW = 3600
+# failed tickers are retried after BACKOFF_BASE * 2 ** (failures - 1), capped
+BACKOFF_BASE = 60
+MAX_BACKOFF = 7 * 24 * 3600
+SAVE_EVERY = 50
+
+
+def fetch_yahoo_metrics(ticker: str) -> dict:
+    """
+    Default fetcher: returns YahooFinanceTickerInfo metrics, raising when Yahoo
+    returned no data so that the refresher can back off.
+    """
+    stock_obj = YahooFinanceTickerInfo(ticker)
+    if not stock_obj.info:
+        raise ValueError(f"no data returned by Yahoo Finance for {ticker}")
+    return stock_obj.get_all_metrics()
+
+
+class YahooQuoteRefresher:
+    """
+    Keeps YahooFinanceTickerInfo metrics warm for a universe of tickers under a fixed
+    request budget.
+
+    Every refresh round picks the tickers with the highest priority: never fetched
+    or stale tickers first, with a boost for tickers passing the screen and tickers
+    recently viewed. Failing tickers back off exponentially.
+
+    The fetcher and the clock can be replaced, e.g. by a local stub in tests:
+        refresher = YahooQuoteRefresher(fetcher=lambda t: {gv.P_E_RATIO: 10.0},
+                                        cache_file=None)
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[[str], dict] = fetch_yahoo_metrics,
+        requests_per_minute: int = 60,
+        max_age: float = DEFAULT_MAX_AGE,
+        cache_file: str | None = gv.YAHOO_QUOTES_CACHE_FILE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.fetcher = fetcher
+        self.requests_per_minute = requests_per_minute
+        self.max_age = max_age
+        self.cache_file = cache_file
+        self.clock = clock
+
+        self.universe = set()
+        self.passing = set()
+        self.viewed = {}
+        # ticker -> {"metrics": dict, "fetched": ts, "attempted": ts, "failures": int}
+        self.entries = {}
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._tokens = float(requests_per_minute)
+        self._last_refill = self.clock()
+        self._fetches_since_save = 0
+        self._load_cache()
+
+    # --- priorities -------------------------------------------------------------
+
+    def set_universe(self, tickers: List[str]):
+        with self._lock:
+            self.universe = set(tickers)
+
+    def mark_passing(self, tickers: List[str]):
+        """
+        Sets the tickers currently passing the screen, replacing the previous ones.
+        """
+        with self._lock:
+            self.passing = set(tickers)
+            self.universe |= self.passing
+
+    def mark_viewed(self, tickers: List[str]):
+        now = self.clock()
+        with self._lock:
+            for ticker in tickers:
+                self.viewed[ticker] = now
+            self.universe |= set(tickers)
+
+    def _refresh_schedule(self, ticker: str, now: float) -> tuple[float, float]:
+        """
+        Returns (due time, priority) of a ticker. The ticker is refreshed once the due
+        time has passed, due tickers with the lowest priority value are refreshed first.
+        """
+        is_viewed = now - self.viewed.get(ticker, -VIEWED_WINDOW - 1) <= VIEWED_WINDOW
+        is_passing = ticker in self.passing
+        entry = self.entries.get(ticker)
+        if entry is not None and entry["failures"]:
+            backoff = min(BACKOFF_BASE * 2 ** (entry["failures"] - 1), MAX_BACKOFF)
+            # backing off tickers get no boost
+            due = entry["attempted"] + backoff
+            return due, due
+
+        if entry is None or entry["fetched"] is None:
+            due = 0.0
+        else:
+            max_age = self.max_age
+            if is_viewed:
+                max_age *= VIEWED_MAX_AGE_FACTOR
+            elif is_passing:
+                max_age *= PASSING_MAX_AGE_FACTOR
+            due = entry["fetched"] + max_age
+        priority = due
+        if is_passing:
+            priority -= PASSING_BOOST
+        if is_viewed:
+            priority -= VIEWED_BOOST
+        return due, priority
+
+    def get_due_tickers(self, n: int) -> List[str]:
+        """
+        Returns up to n tickers due for a refresh, highest priority first.
+        """
+        now = self.clock()
+        with self._lock:
+            schedules = [(self._refresh_schedule(t, now), t) for t in self.universe]
+        due = [(priority, t) for (due, priority), t in schedules if due <= now]
+        return [t for _, t in heapq.nsmallest(n, due)]
+
+    # --- fetching ---------------------------------------------------------------
+
+    def _refill_tokens(self):
+        now = self.clock()
+        self._tokens = min(
+            float(self.requests_per_minute),
+            self._tokens + (now - self._last_refill) * self.requests_per_minute / 60.0,
+        )
+        self._last_refill = now
+
+    def refresh_once(self) -> int:
+        """
+        Fetches as many due tickers as the request budget allows.
+
+        Returns:
+            int: The number of requests made.
+        """
+        self._refill_tokens()
+        tickers = self.get_due_tickers(int(self._tokens))
+        for ticker in tickers:
+            if self._stop_event.is_set():
+                break
+            self._tokens -= 1
+            self._fetch(ticker)
+        if self._fetches_since_save >= SAVE_EVERY:
+            self.save_cache()
+        return len(tickers)
+
+    def _fetch(self, ticker: str):
+        now = self.clock()
+        try:
+            metrics = self.fetcher(ticker)
+        except Exception as e:
+            with self._lock:
+                entry = self.entries.setdefault(
+                    ticker, {"metrics": {}, "fetched": None, "failures": 0}
+                )
+                entry["failures"] += 1
+                entry["attempted"] = now
+            print(f"Error refreshing {ticker} ({entry['failures']} failures): {e}")
+            return
+        with self._lock:
+            self.entries[ticker] = {
+                "metrics": metrics,
+                "fetched": now,
+                "attempted": now,
+                "failures": 0,
+            }
+            self._fetches_since_save += 1
+
+    def start(self):
+        """
+        Starts refreshing in a daemon thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="yahoo-quote-refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.save_cache()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self.refresh_once() == 0:
+                # nothing due or no budget: wait for roughly one token
+                self._stop_event.wait(60.0 / max(self.requests_per_minute, 1))
+
+    # --- reading ----------------------------------------------------------------
+
+    def get_metrics(
+        self, tickers: List[str], max_age: float | None = None
+    ) -> pd.DataFrame:
+        """
+        Returns the cached metrics of the given tickers without any network call.
+
+        Args:
+            tickers (List[str]): Tickers to read.
+            max_age (float | None): Ignore metrics older than this many seconds.
+                                    Defaults to the refresher max_age.
+        Returns:
+            pd.DataFrame: One row per ticker, in the given order, with a 'ticker'
+                column and at least the YahooFinanceTickerInfo.METRICS_COLUMNS.
+                Metrics are NaN for tickers without fresh data.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        now = self.clock()
+        rows = []
+        with self._lock:
+            for ticker in tickers:
+                entry = self.entries.get(ticker)
+                row = {"ticker": ticker}
+                if (
+                    entry
+                    and entry["fetched"] is not None
+                    and now - entry["fetched"] <= max_age
+                ):
+                    row.update(entry["metrics"])
+                rows.append(row)
+        df_metrics = pd.DataFrame(rows, columns=["ticker"])
+        if rows:
+            df_metrics = pd.DataFrame(rows)
+        # the metric columns are present even when no ticker has fresh data
+        for col in YahooFinanceTickerInfo.METRICS_COLUMNS:
+            if col not in df_metrics.columns:
+                df_metrics[col] = float("nan")
+        return df_metrics
+
+    # --- persistence ------------------------------------------------------------
+
+    def _load_cache(self):
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                self.entries = json.load(f)
+        except json.JSONDecodeError:
+            self.entries = {}
+
+    def save_cache(self):
+        if self.cache_file is None:
+            return
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        with self._lock:
+            data = json.dumps(self.entries)
+            self._fetches_since_save = 0
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(data)
+        os.replace(tmp_file, self.cache_file)
+
+
+def load_cached_metrics(
+    tickers: List[str], cache_file: str = gv.YAHOO_QUOTES_CACHE_FILE
+) -> pd.DataFrame:
+    """
+    Returns the metrics saved by YahooQuoteRefresher for the given tickers, whatever
+    their age and without any network call (see YahooQuoteRefresher.get_metrics).
+    """
+    return YahooQuoteRefresher(cache_file=cache_file).get_metrics(
+        tickers, max_age=float("inf")
+    )
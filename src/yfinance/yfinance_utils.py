@@ -5,6 +5,13 @@ import src.global_variables as gv
 
 
 class YahooFinanceTickerInfo:
+    METRICS_COLUMNS = (
+        gv.P_E_RATIO,
+        gv.INSIDER_OWNERSHIP,
+        gv.MARKET_CAP,
+        gv.ENTERPRISE_TO_EBITDA,
+    )
+
     def __init__(self, ticker):
         self.ticker = ticker
         self.info = {}
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+from src.fmp import fmp_cashflow, fmp_panel
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+
+
+def write_statement(fmp_dir: str, ticker: str, statement: str, years: dict):
+    """
+    Writes a statement file like the FMP ones: one record per {year: {field: value}},
+    newest first.
+    """
+    os.makedirs(os.path.join(fmp_dir, ticker), exist_ok=True)
+    records = [
+        {"symbol": ticker, fmp_gv.calendar_year: str(year), **fields}
+        for year, fields in sorted(years.items(), reverse=True)
+    ]
+    with open(os.path.join(fmp_dir, ticker, f"{ticker}_{statement}.json"), "w") as f:
+        json.dump(records, f)
+
+
+def write_ticker(
+    fmp_dir: str,
+    ticker: str,
+    fcf: dict,
+    ocf: dict | None = None,
+    revenue: dict | None = None,
+    shares: float = 1e6,
+):
+    """
+    Writes the three statements of a ticker from {year: value} series. OCF defaults
+    to the FCF and revenue to 10 times the FCF of the same years.
+    """
+    ocf = ocf if ocf is not None else fcf
+    revenue = revenue if revenue is not None else {y: 10 * v for y, v in fcf.items()}
+    write_statement(
+        fmp_dir,
+        ticker,
+        fmp_gv.cash_flow_statement,
+        {
+            y: {fmp_gv.freeCashFlow: fcf.get(y), fmp_gv.operative_cash_flow: ocf.get(y)}
+            for y in set(fcf) | set(ocf)
+        },
+    )
+    write_statement(
+        fmp_dir,
+        ticker,
+        fmp_gv.income_statement,
+        {
+            y: {
+                fmp_gv.revenue: v,
+                fmp_gv.gross_profit: v / 2,
+                fmp_gv.net_income_fmp: v / 10,
+                fmp_gv.shares_outstanding: shares,
+            }
+            for y, v in revenue.items()
+        },
+    )
+    write_statement(
+        fmp_dir,
+        ticker,
+        fmp_gv.balance_sheet_statement,
+        {
+            y: {fmp_gv.totalDebt: 100.0, fmp_gv.totalStockholdersEquity: 1000.0}
+            for y in revenue
+        },
+    )
+
+
+@pytest.fixture
+def fmp_dir(tmp_path, monkeypatch) -> str:
+    """
+    Empty FMP data folder used instead of data/fmp by this process.
+    """
+    path = str(tmp_path / "fmp")
+    os.makedirs(path)
+    monkeypatch.setattr(fmp_panel, "FMP_DATA_DIR", path)
+    monkeypatch.setattr(fmp_cashflow, "FMP_DATA_DIR", path)
+    return path
@@ -0,0 +1,139 @@
+import gzip
+import http.client
+import io
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.api_server as api
+import src.global_variables as gv
+
+N_ROWS = 2500
+
+
+def make_scores() -> pd.DataFrame:
+    rows = np.arange(N_ROWS)
+    return pd.DataFrame(
+        {
+            "ticker": [f"T{i}" for i in rows],
+            gv.SCORE: rows % 3,
+            gv.MARKET_CAP: np.where(rows % 4 == 0, np.nan, rows * 1e6),
+            "Sector": np.where(rows % 2 == 0, "Technology", "Energy"),
+        }
+    )
+
+
+@pytest.fixture
+def results(monkeypatch):
+    calls = []
+    df_scores = make_scores()
+
+    def get_results_for_tickers(tickers, screener_parameters):
+        calls.append(screener_parameters)
+        time.sleep(0.2)
+        return df_scores, df_scores
+
+    monkeypatch.setattr(api, "get_results_for_tickers", get_results_for_tickers)
+    monkeypatch.setattr(api, "list_available_tickers", lambda: [])
+    monkeypatch.setattr(api, "get_data_version", lambda: "data")
+    monkeypatch.setattr(api, "get_latest_results_version", lambda: "results")
+    return df_scores, calls
+
+
+@pytest.fixture
+def server(results):
+    server = api.create_server("127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path: str, headers: dict | None = None):
+    connection = http.client.HTTPConnection(*server.server_address)
+    connection.request("GET", path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test_concurrent_queries_compute_the_screen_once(results):
+    _, calls = results
+    service = api.ScreenerQueryService()
+    parameters = {gv.FCF_YEARS: 3, gv.OCF_YEARS: 3}
+    screens = []
+    threads = [
+        threading.Thread(
+            target=lambda: screens.append(service.get_screen(parameters, "v"))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(screens) == 8
+    assert all(screen is screens[0] for screen in screens)
+
+
+def test_etag_round_trip(server):
+    response, body = get(server, "/screen?min_score=2")
+    assert response.status == 200
+    etag = response.getheader("ETag")
+    assert len(json.loads(body)) == (make_scores()[gv.SCORE] >= 2).sum()
+
+    response, body = get(server, "/screen?min_score=2", {"If-None-Match": etag})
+    assert response.status == 304
+    assert body == b""
+
+    response, _ = get(server, "/screen?min_score=1", {"If-None-Match": etag})
+    assert response.status == 200
+
+
+def test_chunked_gzip_response(server, results):
+    df_scores, _ = results
+    response, body = get(server, "/screen?format=csv", {"Accept-Encoding": "gzip"})
+
+    assert response.status == 200
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert response.getheader("Content-Encoding") == "gzip"
+    df = pd.read_csv(io.BytesIO(gzip.decompress(body)))
+    pd.testing.assert_frame_equal(df, df_scores)
+
+
+def test_small_json_bodies_and_errors(server):
+    response, body = get(server, "/facets?min_score=2")
+    assert response.status == 200
+    assert response.getheader("Content-Length") == str(len(body))
+    assert sum(json.loads(body)["facets"]["Sector"].values()) == N_ROWS // 3
+
+    assert get(server, "/unknown")[0].status == 404
+    assert get(server, "/screen?fcf_years=x")[0].status == 400
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 1000])
+def test_block_encoders(chunk_rows):
+    df = make_scores().head(5)
+
+    csv = b"".join(api.encode_dataframe(df, api.FORMAT_CSV, chunk_rows))
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(csv)), df)
+
+    records = json.loads(
+        b"".join(api.encode_dataframe(df, api.FORMAT_JSON, chunk_rows))
+    )
+    assert records == json.loads(df.to_json(orient="records"))
+
+
+def test_block_encoders_with_empty_results():
+    df = make_scores().head(0)
+    assert b"".join(api.encode_dataframe(df, api.FORMAT_JSON)) == b"[]"
+    csv = b"".join(api.encode_dataframe(df, api.FORMAT_CSV))
+    assert csv.decode().strip() == ",".join(df.columns)
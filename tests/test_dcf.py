@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from conftest import write_ticker
+from src.fmp.fmp_panel import load_statement_panel
+from src.valuation.dcf import (
+    DcfValuation,
+    discounted_cash_flow,
+    estimate_fcf_growth,
+    value_universe,
+)
+
+
+def hand_dcf(fcf: float, growth: float, r: float, g: float, years: int) -> float:
+    value = 0.0
+    for t in range(1, years + 1):
+        value += fcf * (1 + growth) ** t / (1 + r) ** t
+    if r <= g:
+        return np.nan
+    last_fcf = fcf * (1 + growth) ** years
+    return value + last_fcf * (1 + g) / (r - g) / (1 + r) ** years
+
+
+def test_discounted_cash_flow_matches_explicit_years_plus_gordon_terminal():
+    fcf_base = np.array([100.0, 50.0])
+    growth = np.array([0.1, -0.05])
+    discount_rates = np.array([0.03, 0.08])
+    terminal_growth_rates = np.array([0.02, 0.03, 0.04])
+
+    values = discounted_cash_flow(
+        fcf_base, growth, discount_rates, terminal_growth_rates, years=3
+    )
+
+    assert values.shape == (2, 2, 3)
+    for i in range(2):
+        for j, r in enumerate(discount_rates):
+            for k, g in enumerate(terminal_growth_rates):
+                expected = hand_dcf(fcf_base[i], growth[i], r, g, 3)
+                if np.isnan(expected):
+                    assert np.isnan(values[i, j, k])
+                else:
+                    assert np.isclose(values[i, j, k], expected)
+    # r <= g has no terminal value
+    assert np.isnan(values[:, 0, 1:]).all()
+
+
+def test_estimate_fcf_growth():
+    fcf = np.array(
+        [
+            [np.nan, 100.0, 110.0, 121.0],
+            [np.nan, -10.0, 50.0, 100.0],
+            [np.nan, 100.0, 200.0, 400.0],
+            [np.nan, np.nan, 110.0, 121.0],
+        ]
+    )
+    growth = estimate_fcf_growth(fcf, n=3)
+    # CAGR, undefined for a negative or missing first value, clipped to 30%
+    assert np.allclose(growth, [0.1, 0.0, 0.3, 0.0])
+    assert np.allclose(estimate_fcf_growth(fcf, n=10)[:1], [0.0])
+    assert np.allclose(estimate_fcf_growth(fcf, n=2)[:1], [0.1])
+
+
+def test_margin_of_safety():
+    intrinsic_value = np.array([200.0, 100.0, 50.0]).reshape(3, 1, 1)
+    valuation = DcfValuation(
+        ["A", "B", "C"],
+        np.array([0.1]),
+        np.array([0.02]),
+        np.zeros(3),
+        intrinsic_value,
+        np.array([10.0, 10.0, np.nan]),
+    )
+    market_caps = pd.Series({"A": 150.0, "B": 0.0, "D": 10.0})
+
+    margin = valuation.margin_of_safety(market_caps)[:, 0, 0]
+    # 1 - 150 / 200, no positive market cap for B and C
+    assert np.isclose(margin[0], 0.25)
+    assert np.isnan(margin[1:]).all()
+    assert np.isclose(valuation.value_per_share[0, 0, 0], 20.0)
+    assert np.isnan(valuation.value_per_share[2, 0, 0])
+
+
+def test_value_universe_uses_the_last_cash_flow_year(fmp_dir):
+    # the income statement already has 2024, the cash flow statement stops in 2023
+    write_ticker(
+        fmp_dir,
+        "LAG",
+        fcf={2020: 100.0, 2021: 110.0, 2022: 121.0, 2023: 133.1},
+        revenue={year: 1000.0 for year in range(2020, 2025)},
+        shares=100.0,
+    )
+    panel = load_statement_panel(["LAG"])
+    discount_rates = np.array([0.1])
+    terminal_growth_rates = np.array([0.02])
+
+    valuation = value_universe(
+        panel, discount_rates, terminal_growth_rates, growth_years=3
+    )
+
+    assert np.isclose(valuation.growth[0], 0.1)
+    expected = hand_dcf(133.1, 0.1, 0.1, 0.02, 5)
+    assert np.isclose(valuation.intrinsic_value[0, 0, 0], expected)
+    assert np.isclose(valuation.value_per_share[0, 0, 0], expected / 100.0)
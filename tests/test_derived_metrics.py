@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+
+from conftest import write_ticker
+from src.fmp.fmp_derived_metrics import (
+    _write_ticker_metrics,
+    compute_derived_metrics,
+    load_derived_metrics,
+    refresh_derived_metrics,
+)
+from src.fmp.fmp_panel import load_statement_panel, scan_statement_signatures
+
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+def _write_repeatedly(tickers, n_writes):
+    panel = load_statement_panel(tickers)
+    metrics = compute_derived_metrics(panel)
+    signatures = scan_statement_signatures(tickers)
+    for _ in range(n_writes):
+        for t_idx, ticker in enumerate(tickers):
+            _write_ticker_metrics(panel, metrics, t_idx, signatures[ticker])
+
+
+def test_refresh_only_recomputes_changed_tickers(fmp_dir):
+    for ticker in TICKERS:
+        write_ticker(fmp_dir, ticker, {2021: 1.0, 2022: 2.0, 2023: 3.0})
+    assert refresh_derived_metrics(TICKERS) == TICKERS
+    assert refresh_derived_metrics(TICKERS) == []
+
+    write_ticker(fmp_dir, "BBB", {2022: 2.0, 2023: 3.0, 2024: 4.0})
+    assert refresh_derived_metrics(TICKERS) == ["BBB"]
+    assert load_derived_metrics(TICKERS)["ticker"].tolist() == TICKERS
+
+
+def test_concurrent_writers_do_not_fail(fmp_dir):
+    for ticker in TICKERS:
+        write_ticker(fmp_dir, ticker, {2021: 1.0, 2022: 2.0, 2023: 3.0})
+
+    # forked workers inherit the temporary data folder
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=_write_repeatedly, args=(TICKERS, 50)) for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+    assert refresh_derived_metrics(TICKERS) == []
+    assert len(load_derived_metrics(TICKERS)) == len(TICKERS)
+    for ticker in TICKERS:
+        assert not [f for f in os.listdir(os.path.join(fmp_dir, ticker)) if ".tmp" in f]
+
+
+def test_refresh_of_changed_tickers_keeps_the_others(fmp_dir):
+    for ticker in TICKERS:
+        write_ticker(fmp_dir, ticker, {2021: 1.0, 2022: 2.0, 2023: 3.0})
+    refresh_derived_metrics(TICKERS)
+
+    write_ticker(fmp_dir, "AAA", {2022: 2.0, 2023: 3.0, 2024: 4.0})
+    # like the watch service: signatures of the full scan, only "AAA" changed
+    signatures = scan_statement_signatures(TICKERS)
+    assert refresh_derived_metrics(["AAA"], signatures) == ["AAA"]
+    assert refresh_derived_metrics(TICKERS) == []
@@ -0,0 +1,139 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.finviz import finviz_screener
+from src.finviz.finviz_screener import (
+    compute_universe_diff,
+    get_snapshot_diff_file,
+    list_universe_snapshots,
+    load_universe_diff,
+    merge_universe_diffs,
+    publish_universe_snapshot,
+)
+from src.global_variables import ADDED_TICKERS, CHANGED_TICKERS, REMOVED_TICKERS
+
+
+def universe(*rows) -> pd.DataFrame:
+    """
+    Universe table from (ticker, sector, industry, country) rows.
+    """
+    return pd.DataFrame(
+        [(ticker, f"{ticker} Inc", *row) for ticker, *row in rows],
+        columns=["Ticker", "Company", "Sector", "Industry", "Country"],
+    )
+
+
+def diff(added=(), removed=(), changed=None) -> dict:
+    return {
+        ADDED_TICKERS: list(added),
+        REMOVED_TICKERS: list(removed),
+        CHANGED_TICKERS: changed or {},
+    }
+
+
+A = ("A", "Energy", "Oil", "USA")
+B = ("B", "Technology", "Software", "USA")
+B_MOVED = ("B", "Technology", "Software", "Canada")
+C = ("C", "Utilities", "Water", None)
+
+
+@pytest.mark.parametrize(
+    "old, new, expected",
+    [
+        ([A, B], [A, B], diff()),
+        ([A], [A, B, C], diff(added=["B", "C"])),
+        ([A, B, C], [B], diff(removed=["A", "C"])),
+        ([A, B], [A, B_MOVED], diff(changed={"B": {"Country": ["USA", "Canada"]}})),
+        (
+            [A, C],
+            [A, ("C", "Utilities", "Water", "USA")],
+            diff(changed={"C": {"Country": [None, "USA"]}}),
+        ),
+        (
+            [A, B],
+            [B_MOVED, C],
+            diff(["C"], ["A"], {"B": {"Country": ["USA", "Canada"]}}),
+        ),
+    ],
+)
+def test_compute_universe_diff(old, new, expected):
+    assert compute_universe_diff(universe(*old), universe(*new)) == expected
+
+
+SECTOR_B = {"B": {"Sector": ["Technology", "Energy"]}}
+
+
+@pytest.mark.parametrize(
+    "diffs, expected",
+    [
+        ([], diff()),
+        # add then remove: never seen by the consumer
+        ([diff(added=["B"]), diff(removed=["B"])], diff(removed=["B"])),
+        # remove then re-add: processed from scratch
+        ([diff(removed=["B"]), diff(added=["B"])], diff(added=["B"])),
+        # reclassify then remove
+        ([diff(changed=SECTOR_B), diff(removed=["B"])], diff(removed=["B"])),
+        # add then reclassify: the new classification is read when processed
+        ([diff(added=["B"]), diff(changed=SECTOR_B)], diff(added=["B"])),
+        # two reclassifications: oldest and newest values
+        (
+            [
+                diff(changed=SECTOR_B),
+                diff(changed={"B": {"Sector": ["Energy", "Utilities"]}}),
+            ],
+            diff(changed={"B": {"Sector": ["Technology", "Utilities"]}}),
+        ),
+        (
+            [diff(added=["A"], changed=SECTOR_B), diff(removed=["C"])],
+            diff(added=["A"], removed=["C"], changed=SECTOR_B),
+        ),
+    ],
+)
+def test_merge_universe_diffs(diffs, expected):
+    merged = merge_universe_diffs(diffs)
+    merged.pop("snapshot", None)
+    assert merged == expected
+
+
+@pytest.fixture
+def finviz_dir(tmp_path, monkeypatch) -> str:
+    path = str(tmp_path / "finviz")
+    monkeypatch.setattr(
+        finviz_screener, "UNIVERSE_SNAPSHOTS_DIR", os.path.join(path, "snapshots")
+    )
+    monkeypatch.setattr(
+        finviz_screener, "ALL_STOCKS_INFO_FILE", os.path.join(path, "all.csv")
+    )
+    monkeypatch.setattr(
+        finviz_screener, "UNIVERSE_DIFF_FILE", os.path.join(path, "diff.json")
+    )
+    monkeypatch.setattr(finviz_screener, "KEEP_UNIVERSE_SNAPSHOTS", 2)
+    return path
+
+
+def test_old_snapshots_are_deleted_with_their_diffs(finviz_dir):
+    publish_universe_snapshot(universe(A))
+    cursor = publish_universe_snapshot(universe(A, B))["snapshot"]
+    publish_universe_snapshot(universe(A, B_MOVED))
+    assert load_universe_diff(cursor) == {
+        **diff(changed={"B": {"Country": ["USA", "Canada"]}}),
+        "snapshot": list_universe_snapshots()[-1],
+    }
+
+    publish_universe_snapshot(universe(B_MOVED, C))
+    snapshots = list_universe_snapshots()
+    assert len(snapshots) == 2
+    assert sorted(os.listdir(os.path.join(finviz_dir, "snapshots"))) == sorted(
+        snapshots + [os.path.basename(get_snapshot_diff_file(s)) for s in snapshots]
+    )
+    # the diff right after the cursor is gone: every ticker is processed again
+    assert load_universe_diff(cursor) == {
+        **diff(added=["B", "C"]),
+        "snapshot": snapshots[-1],
+    }
+    assert load_universe_diff(snapshots[0]) == {
+        **diff(added=["C"], removed=["A"]),
+        "snapshot": snapshots[-1],
+    }
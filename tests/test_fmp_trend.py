@@ -0,0 +1,92 @@
+import numpy as np
+
+from conftest import write_ticker
+from src.fmp.fmp_global_variables import GlobalVars as fmp_gv
+from src.fmp.fmp_panel import load_statement_panel
+from src.fmp.fmp_trend import MIN_TREND_POINTS, compute_trend_features, fit_trends
+
+NAN = np.nan
+
+
+def polyfit_trend(row: np.ndarray, n: int) -> tuple[float, float]:
+    """
+    Relative slope and R² of the last n years of a row with np.polyfit.
+    """
+    y = row[-n:]
+    x = np.arange(n, dtype=float)
+    mask = ~np.isnan(y)
+    slope, intercept = np.polyfit(x[mask], y[mask], 1)
+    fitted = slope * x[mask] + intercept
+    residuals = np.sum((y[mask] - fitted) ** 2)
+    total = np.sum((y[mask] - y[mask].mean()) ** 2)
+    return slope / np.abs(y[mask]).mean(), 1.0 - residuals / total
+
+
+def test_fit_trends_matches_polyfit_with_gaps():
+    values = np.array(
+        [
+            [1.0, 2.5, 2.0, 4.0, 5.5],
+            [NAN, 3.0, NAN, 4.0, 6.0],
+            [10.0, NAN, 8.0, 7.5, NAN],
+            [-2.0, -1.0, 1.0, 0.5, 3.0],
+        ]
+    )
+    for n in (3, 4, 5):
+        trends = fit_trends(values.copy(), n)
+        for i, row in enumerate(values):
+            if np.sum(~np.isnan(row[-n:])) < min(n, MIN_TREND_POINTS):
+                assert np.isnan(trends["slope"][i])
+                continue
+            slope, r2 = polyfit_trend(row, n)
+            assert np.isclose(trends["slope"][i], slope)
+            assert np.isclose(trends["r2"][i], r2)
+
+
+def test_fit_trends_short_rows_and_cagr():
+    values = np.array(
+        [
+            [NAN, NAN, NAN, 4.0, 5.0],
+            [NAN, 100.0, 110.0, NAN, 133.1],
+            [NAN, -1.0, 2.0, 3.0, 4.0],
+        ]
+    )
+    trends = fit_trends(values, 4)
+    # two valid years are not enough for a 4 years trend
+    assert np.isnan(trends["slope"][0]) and np.isnan(trends["last"][0])
+    # CAGR between the first and last valid years
+    assert np.isclose(trends["cagr"][1], 0.1)
+    assert trends["last"][1] == 133.1
+    # not defined from a negative value
+    assert np.isnan(trends["cagr"][2])
+
+
+def test_fit_trends_with_two_years():
+    values = np.array([[NAN, NAN, NAN, 4.0, 5.0], [NAN, NAN, NAN, NAN, 5.0]])
+    trends = fit_trends(values, 2)
+    # the line goes through both points
+    assert np.isclose(trends["slope"][0], 1.0 / 4.5)
+    assert np.isclose(trends["r2"][0], 1.0)
+    assert np.isclose(trends["cagr"][0], 0.25)
+    assert np.isnan(trends["slope"][1])
+
+
+def test_cash_flow_trends_use_the_cash_flow_years(fmp_dir):
+    # the income statement already has 2024, the cash flow statement stops in 2023
+    write_ticker(
+        fmp_dir,
+        "LAG",
+        fcf={2021: 100.0, 2022: 110.0, 2023: 121.0},
+        revenue={2021: 1000.0, 2022: 1100.0, 2023: 1200.0, 2024: 1300.0},
+    )
+    panel = load_statement_panel(["LAG", "MISSING"])
+
+    df_trends = compute_trend_features(panel, 3)
+
+    lag = df_trends.iloc[0]
+    assert lag[fmp_gv.fcf_regression_trend_condition]
+    assert lag[fmp_gv.ocf_regression_trend_condition]
+    assert lag[fmp_gv.revenue_regression_trend_condition]
+    assert np.isclose(lag["FCF CAGR"], 0.1)
+    # revenue keeps the calendar years, up to 2024
+    assert np.isclose(lag["Revenue CAGR"], (1300.0 / 1100.0) ** 0.5 - 1)
+    assert not df_trends.iloc[1][fmp_gv.fcf_regression_trend_condition]
@@ -0,0 +1,23 @@
+import numpy as np
+
+from conftest import write_ticker
+from src.compare.peer_ranking import build_peer_metrics
+from src.fmp.fmp_panel import load_statement_panel
+import src.global_variables as gv
+
+
+def test_growth_uses_the_cash_flow_years(fmp_dir):
+    write_ticker(fmp_dir, "CUR", fcf={2022: 100.0, 2023: 110.0, 2024: 121.0})
+    # the income statement already has 2024, the cash flow statement stops in 2023
+    write_ticker(
+        fmp_dir,
+        "LAG",
+        fcf={2021: 100.0, 2022: 110.0, 2023: 121.0},
+        revenue={year: 1000.0 for year in range(2021, 2025)},
+    )
+    panel = load_statement_panel(["CUR", "LAG"])
+
+    df_metrics = build_peer_metrics(panel, fcf_years=3, ocf_years=2)
+
+    assert np.allclose(df_metrics[gv.FCF_GROWTH], [0.21, 0.21])
+    assert np.allclose(df_metrics[gv.OCF_GROWTH], [0.1, 0.1])
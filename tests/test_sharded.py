@@ -0,0 +1,163 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import write_ticker
+import src.global_variables as gv
+from src.sharded import partition_tickers, run_sharded
+
+# tickers without statement data: the workers run end to end and write empty results
+TICKERS = [f"NODATA{i}" for i in range(6)]
+PARAMS = {gv.FCF_YEARS: 3, gv.OCF_YEARS: 2}
+
+
+def test_partition_covers_every_ticker_once():
+    shards = partition_tickers(TICKERS, 3)
+    assert sorted(t for shard in shards for t in shard) == sorted(TICKERS)
+    assert partition_tickers(TICKERS, 3) == shards
+
+
+def test_shards_run_in_local_processes_behind_quoted_launcher(tmp_path):
+    output_dir = str(tmp_path)
+    # like "ssh host '...{command}'": the command must not close the quotes
+    df_scores, df_features = run_sharded(
+        PARAMS,
+        n_shards=3,
+        output_dir=output_dir,
+        tickers=TICKERS,
+        max_attempts=1,
+        launcher="sh -c '{command}'",
+    )
+
+    assert df_scores.empty and df_features.empty
+    for shard_id in range(3):
+        assert os.path.exists(os.path.join(output_dir, f"_SUCCESS_{shard_id}"))
+    with open(os.path.join(output_dir, "params.json")) as f:
+        assert json.load(f) == PARAMS
+
+
+def test_failed_shards_are_retried(tmp_path):
+    output_dir = str(tmp_path)
+    # every worker fails on its first attempt
+    tried = os.path.join(output_dir, "tried_{shard_id}")
+    launcher = f"if [ -e {tried} ]; then {{command}}; else touch {tried}; exit 1; fi"
+    run_sharded(
+        PARAMS,
+        n_shards=2,
+        output_dir=output_dir,
+        tickers=TICKERS,
+        max_attempts=2,
+        launcher=launcher,
+    )
+
+    for shard_id in range(2):
+        assert os.path.exists(os.path.join(output_dir, f"tried_{shard_id}"))
+        assert os.path.exists(os.path.join(output_dir, f"_SUCCESS_{shard_id}"))
+
+
+def test_hung_shards_are_killed_after_timeout(tmp_path):
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match="after 2 attempts"):
+        run_sharded(
+            PARAMS,
+            n_shards=2,
+            output_dir=str(tmp_path),
+            tickers=TICKERS,
+            max_attempts=2,
+            launcher="sleep 60",
+            shard_timeout=0.5,
+        )
+    assert time.monotonic() - start < 10
+
+
+REFERENCE_SCRIPT = """
+import json, sys
+from src.main import process_tickers
+with open(sys.argv[1]) as f:
+    tickers = json.load(f)
+df_scores, _ = process_tickers(tickers, json.loads(sys.argv[2]))
+df_scores.to_csv(sys.argv[3], index=False)
+"""
+
+
+def write_data_dir(tmp_path) -> tuple[str, list[str]]:
+    """
+    Writes a small universe: statements under fmp/ and the finviz universe file.
+    """
+    data_dir = str(tmp_path / "data")
+    fmp_dir = os.path.join(data_dir, "fmp")
+    rng = np.random.default_rng(0)
+    tickers = [f"T{i:02d}" for i in range(12)]
+    for i, ticker in enumerate(tickers):
+        fcf = np.cumsum(rng.normal(1.0, 1.5, 5)) + 2.0
+        ocf = fcf + rng.normal(1.0, 0.5, 5)
+        years = range(2019, 2024)
+        revenue = {year: 100.0 + 10 * k for k, year in enumerate(range(2019, 2025))}
+        write_ticker(
+            fmp_dir,
+            ticker,
+            fcf=dict(zip(years, fcf.tolist())),
+            ocf=dict(zip(years, ocf.tolist())),
+            # every third ticker already has an income statement for 2024
+            revenue=revenue if i % 3 == 0 else None,
+        )
+    os.makedirs(os.path.join(data_dir, "finviz"))
+    pd.DataFrame(
+        {
+            "Ticker": tickers,
+            "Company": tickers,
+            "Sector": ["Technology", "Energy"] * 6,
+            "Industry": ["Software", "Oil"] * 6,
+            "Country": "USA",
+        }
+    ).to_csv(os.path.join(data_dir, "finviz", "all_stocks_tickers.csv"), index=False)
+    return data_dir, tickers
+
+
+def test_sharded_results_match_a_single_run(tmp_path, monkeypatch):
+    data_dir, tickers = write_data_dir(tmp_path)
+    # workers and the reference run read the temporary data folder
+    monkeypatch.setenv("SCREENER_DATA_DIR", data_dir)
+    tickers_file = str(tmp_path / "tickers.json")
+    with open(tickers_file, "w") as f:
+        json.dump(tickers, f)
+    reference_file = str(tmp_path / "reference.csv")
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            REFERENCE_SCRIPT,
+            tickers_file,
+            json.dumps(PARAMS),
+            reference_file,
+        ],
+        cwd=gv.MAIN_DIR,
+        check=True,
+    )
+    df_reference = pd.read_csv(reference_file)
+
+    df_scores, df_features = run_sharded(
+        PARAMS,
+        n_shards=3,
+        output_dir=str(tmp_path / "run"),
+        tickers=tickers,
+        max_attempts=1,
+    )
+
+    assert sorted(df_scores["ticker"]) == tickers
+    assert sorted(df_features["ticker"]) == tickers
+    assert df_reference[gv.SCORE].nunique() > 1
+    # global rank over all shards: 1 for the best score, ties share the rank
+    df_reference[gv.RANK] = (
+        df_reference[gv.SCORE].rank(method="min", ascending=False).astype(int)
+    )
+    pd.testing.assert_frame_equal(
+        df_scores.set_index("ticker").sort_index(),
+        df_reference.set_index("ticker").sort_index()[df_scores.columns.drop("ticker")],
+    )
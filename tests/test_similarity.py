@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+
+from conftest import write_ticker
+from src.compare.similarity import CashFlowProfileIndex
+
+
+def write_universe(fmp_dir):
+    write_ticker(fmp_dir, "UP", fcf={2021: 1.0, 2022: 2.0, 2023: 3.0})
+    write_ticker(fmp_dir, "UP2", fcf={2021: 10.0, 2022: 20.0, 2023: 30.0})
+    write_ticker(fmp_dir, "DOWN", fcf={2021: 3.0, 2022: 2.0, 2023: 1.0})
+
+
+def test_refresh_returns_a_new_index_and_keeps_the_old_one(fmp_dir):
+    write_universe(fmp_dir)
+    index = CashFlowProfileIndex.build()
+    tickers, vectors = list(index.tickers), index.vectors.copy()
+    assert index.refresh() is index
+
+    write_ticker(fmp_dir, "DOWN", fcf={2021: 1.0, 2022: 2.0, 2023: 3.0})
+    write_ticker(fmp_dir, "NEW", fcf={2021: 5.0, 2022: 4.0, 2023: 1.0})
+    refreshed = index.refresh()
+
+    assert refreshed is not index
+    assert index.tickers == tickers
+    assert np.array_equal(index.vectors, vectors)
+    assert sorted(refreshed.tickers) == ["DOWN", "NEW", "UP", "UP2"]
+    # the changed ticker now has the same trajectory shape as UP
+    assert refreshed.query("DOWN", k=2)["ticker"].tolist()[:2] in (
+        ["UP", "UP2"],
+        ["UP2", "UP"],
+    )
+
+
+def test_save_and_load(fmp_dir, tmp_path):
+    write_universe(fmp_dir)
+    index = CashFlowProfileIndex.build()
+    file_path = str(tmp_path / "similarity" / "profile_index.npz")
+
+    index.save(file_path)
+    index.save(file_path)
+    loaded = CashFlowProfileIndex.load(file_path)
+
+    assert os.listdir(tmp_path / "similarity") == ["profile_index.npz"]
+    assert loaded.tickers == index.tickers
+    assert np.array_equal(loaded.vectors, index.vectors)
+    assert loaded.refresh() is loaded
@@ -0,0 +1,93 @@
+import src.global_variables as gv
+from src.yfinance.yfinance_refresher import BACKOFF_BASE, YahooQuoteRefresher
+
+
+class StubClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubFetcher:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def __call__(self, ticker: str) -> dict:
+        self.calls.append(ticker)
+        if ticker in self.failing:
+            raise ValueError(f"no data for {ticker}")
+        return {gv.P_E_RATIO: 10.0, gv.MARKET_CAP: 1e9}
+
+
+def make_refresher(requests_per_minute: int = 60, failing=()):
+    clock = StubClock()
+    fetcher = StubFetcher(failing)
+    refresher = YahooQuoteRefresher(
+        fetcher=fetcher,
+        requests_per_minute=requests_per_minute,
+        max_age=3600,
+        cache_file=None,
+        clock=clock,
+    )
+    return refresher, fetcher, clock
+
+
+def test_refresh_respects_request_budget():
+    refresher, fetcher, clock = make_refresher(requests_per_minute=2)
+    refresher.set_universe(["A", "B", "C", "D"])
+
+    assert refresher.refresh_once() == 2
+    assert refresher.refresh_once() == 0
+    clock.now += 30
+    assert refresher.refresh_once() == 1
+    assert len(fetcher.calls) == 3
+
+
+def test_never_fetched_tickers_come_first_at_time_zero():
+    refresher, fetcher, clock = make_refresher(requests_per_minute=2)
+    refresher.set_universe(["A", "D"])
+    refresher.refresh_once()
+    assert sorted(fetcher.calls) == ["A", "D"]
+
+    refresher.set_universe(["A", "B", "C", "D"])
+    clock.now += 60
+    refresher.refresh_once()
+    assert sorted(fetcher.calls[2:]) == ["B", "C"]
+
+
+def test_viewed_and_passing_tickers_are_refreshed_first():
+    refresher, fetcher, clock = make_refresher(requests_per_minute=2)
+    refresher.set_universe(["A", "B", "C", "D"])
+    refresher.mark_passing(["C"])
+    refresher.mark_viewed(["D"])
+
+    refresher.refresh_once()
+    assert fetcher.calls == ["D", "C"]
+
+
+def test_failing_ticker_backs_off():
+    refresher, fetcher, clock = make_refresher(failing=["A"])
+    refresher.set_universe(["A"])
+
+    refresher.refresh_once()
+    refresher.refresh_once()
+    assert fetcher.calls == ["A"]
+    clock.now += BACKOFF_BASE
+    refresher.refresh_once()
+    assert fetcher.calls == ["A", "A"]
+
+
+def test_get_metrics_ignores_stale_entries():
+    refresher, fetcher, clock = make_refresher()
+    refresher.set_universe(["A"])
+    refresher.refresh_once()
+
+    df_metrics = refresher.get_metrics(["A", "B"])
+    assert df_metrics[gv.P_E_RATIO].tolist()[0] == 10.0
+    assert df_metrics[gv.P_E_RATIO].isna().tolist() == [False, True]
+
+    clock.now += 3601
+    assert refresher.get_metrics(["A"])[gv.P_E_RATIO].isna().all()